@@ -0,0 +1,260 @@
+# -*- coding: utf-8 -*-
+"""
+Headless batch runner: calculates the efficient frontier for one or more
+scenario workbooks without Streamlit.
+
+Results are written to the output directory as soon as each scenario is
+finished, one sub-directory per scenario:
+
+    <output>/<scenario>/frontier.<fmt>
+    <output>/<scenario>/stats.<fmt>
+    <output>/<scenario>/correlation.<fmt>
+    <output>/<scenario>/_SUCCESS
+
+With --resume, scenarios whose _SUCCESS marker records the same workbook
+content, dates, risk-free rate, frequency and other options are skipped; the
+others are recalculated.
+
+Example:
+    python batch.py data/asset_classes.xlsx data/industry_sectors.xlsx \\
+        --start 2007-05-29 --end 2023-05-20 --risk-free-rate 3.7 \\
+        --output results --format jsonl --resume
+
+@author: evan_
+"""
+import argparse
+import json
+import os
+import sys
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+from typing import TYPE_CHECKING
+import pandas as pd
+import port_stats as ps
+import efrontier as ef
+from scenarios import load_scenario
+
+if TYPE_CHECKING:
+    from shared_store import SharedStore
+
+FORMATS: list[str] = ["jsonl", "parquet"]
+PROVIDERS: list[str] = ["yfinance", "csv"]
+SUCCESS_MARKER = "_SUCCESS"
+
+
+# ---------------------------------------------------------------------------- #
+def get_prices(
+    provider: str,
+    tickers: list[str],
+    start_date: str,
+    end_date: str,
+    prices_csv: str | None = None,
+    store: "SharedStore | None" = None,
+) -> pd.DataFrame:
+    """
+    Retrieve adjusted daily closing prices from the selected data provider.
+
+    Args:
+        provider (str): "yfinance" or "csv"
+        tickers (list[str]): tickers to be retrieved
+        start_date (str): Start date in format YYYY-MM-DD
+        end_date (str): End date in format YYYY-MM-DD
+        prices_csv (str | None): for the csv provider, a file with a Date
+            column followed by one column of adjusted closes per ticker
+        store (SharedStore | None): for the yfinance provider, shared store
+            for downloaded prices
+
+    Returns:
+        pd.DataFrame:
+            Column Heading(s): tickers
+            Index: Date
+            df Contents: Adjusted daily closing prices
+    """
+    if provider == "yfinance":
+        import yfinance_api as yf_api
+
+        return yf_api.get_adj_daily_close(tickers, start_date, end_date, store)
+    if provider == "csv":
+        if prices_csv is None:
+            raise ValueError("The csv provider requires --prices-csv")
+        adj_close = _read_prices_csv(prices_csv)
+        missing = [t for t in tickers if t not in adj_close.columns]
+        if missing:
+            raise ValueError(f"Invalid Ticker: {', '.join(missing)}")
+        return adj_close.loc[start_date:end_date, tickers]
+    raise ValueError(f"Invalid provider: {provider}. Must be one of {PROVIDERS}")
+
+
+@lru_cache(maxsize=4)
+def _read_prices_csv(prices_csv: str) -> pd.DataFrame:
+    # Parsed once per process; many work units read the same file
+    return pd.read_csv(prices_csv, index_col=0, parse_dates=True)
+
+
+def write_table(df: pd.DataFrame, path: Path, fmt: str) -> None:
+    """
+    Write df to path atomically, so an interrupted run never leaves a
+    partially written file behind.
+    """
+    tmp = path.with_name(path.name + ".tmp")
+    if fmt == "parquet":
+        df.to_parquet(tmp)
+    else:
+        df.reset_index().to_json(tmp, orient="records", lines=True, date_format="iso")
+    os.replace(tmp, path)
+
+
+def get_run_params(scenario: Path, digest: str, args: argparse.Namespace) -> dict:
+    """
+    Parameters that determine the results of a scenario run, including the
+    SHA-256 of the workbook content, so an edited workbook is recalculated.
+    """
+    return {
+        "scenario": str(scenario),
+        "scenario_sha256": digest,
+        "start": args.start,
+        "end": args.end,
+        "risk_free_rate": args.risk_free_rate,
+        "frequency": args.frequency,
+        "pairwise": args.pairwise,
+        "provider": args.provider,
+        "prices_csv": args.prices_csv,
+        "format": args.format,
+    }
+
+
+def is_complete(out_dir: Path, params: dict) -> bool:
+    """True if out_dir has a _SUCCESS marker written with the same params."""
+    try:
+        marker = json.loads((out_dir / SUCCESS_MARKER).read_text())
+    except (FileNotFoundError, json.JSONDecodeError):
+        return False
+    return all(marker.get(k) == v for k, v in params.items())
+
+
+def run_scenario(
+    scenario: Path,
+    out_dir: Path,
+    args: argparse.Namespace,
+) -> None:
+    """
+    Calculate and write the statistics and efficient frontier for one scenario.
+    """
+    # Until the new marker is written, out_dir may mix old and new results
+    (out_dir / SUCCESS_MARKER).unlink(missing_ok=True)
+    parsed = load_scenario(scenario, validate=False)
+    tickers_and_constraints = parsed.tickers_and_constraints
+    group_constraints = parsed.group_constraints
+    tickers = tickers_and_constraints["Ticker"].tolist()
+    adj_daily_close = get_prices(
+        args.provider, tickers, args.start, args.end, args.prices_csv
+    )
+
+    adj_close = ps.resample_prices(adj_daily_close, args.frequency)
+    periods_per_year = ps.PERIODS_PER_YEAR[args.frequency]
+    if args.pairwise:
+        ln_returns = ps.get_pairwise_daily_ln_returns(adj_close)
+        correlation_matrix = ps.get_pairwise_correlation_matrix(
+            ps.get_pairwise_cov_matrix(ln_returns)
+        )
+    else:
+        ln_returns = ps.get_daily_ln_returns(adj_close)
+        correlation_matrix = ps.get_correlation_matrix(ln_returns)
+    stats = pd.DataFrame(
+        {
+            "Return": ps.get_expected_returns(ln_returns, periods_per_year),
+            "Std Dev": ps.get_std_deviations(ln_returns, periods_per_year),
+        }
+    )
+    stats.index.name = "Ticker"
+    correlation_matrix.index.name = "Ticker"
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    ext = args.format
+    write_table(stats, out_dir / f"stats.{ext}", args.format)
+    write_table(correlation_matrix, out_dir / f"correlation.{ext}", args.format)
+    del ln_returns, correlation_matrix, stats
+
+    efficient_frontier = ef.get_efficient_frontier(
+        tickers_and_constraints,
+        args.risk_free_rate / 100,
+        adj_daily_close,
+        pairwise=args.pairwise,
+        frequency=args.frequency,
+        group_constraints=group_constraints,
+    )
+    write_table(efficient_frontier, out_dir / f"frontier.{ext}", args.format)
+
+    (out_dir / SUCCESS_MARKER).write_text(
+        json.dumps(
+            {
+                **get_run_params(scenario, parsed.digest, args),
+                "points": len(efficient_frontier),
+                "finished": datetime.now().isoformat(timespec="seconds"),
+            }
+        )
+    )
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Calculate efficient frontiers for scenario workbooks."
+    )
+    parser.add_argument("scenarios", nargs="+", help="scenario Excel workbooks")
+    parser.add_argument("--start", required=True, help="start date, YYYY-MM-DD")
+    parser.add_argument("--end", required=True, help="end date, YYYY-MM-DD")
+    parser.add_argument(
+        "--risk-free-rate",
+        type=float,
+        default=0.0,
+        help="risk-free rate in percent, e.g. 3.7",
+    )
+    parser.add_argument("--provider", choices=PROVIDERS, default="yfinance")
+    parser.add_argument("--prices-csv", help="price file for the csv provider")
+    parser.add_argument(
+        "--frequency", choices=list(ps.PERIODS_PER_YEAR), default="daily"
+    )
+    parser.add_argument(
+        "--pairwise",
+        action="store_true",
+        help="use pairwise-complete statistics for ragged histories",
+    )
+    parser.add_argument("--output", default="results", help="output directory")
+    parser.add_argument("--format", choices=FORMATS, default="jsonl")
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="skip scenarios already complete with the same parameters",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+    if pd.Timestamp(args.end) < pd.Timestamp(args.start):
+        print("Error! Start Date must be less than End Date.", file=sys.stderr)
+        return 2
+
+    failed = 0
+    for scenario in map(Path, args.scenarios):
+        out_dir = Path(args.output) / scenario.stem
+        try:
+            digest = load_scenario(scenario, validate=False).digest
+            if args.resume and is_complete(
+                out_dir, get_run_params(scenario, digest, args)
+            ):
+                print(f"{scenario}: already complete, skipping")
+                continue
+            run_scenario(scenario, out_dir, args)
+        except Exception as e:
+            failed += 1
+            print(f"{scenario}: Error! {e}", file=sys.stderr)
+            continue
+        print(f"{scenario}: written to {out_dir}")
+    return 1 if failed else 0
+
+
+# ---------------------------------------------------------------------------- #
+if __name__ == "__main__":
+    sys.exit(main())
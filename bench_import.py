@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+Import-time benchmark for the computational core.
+
+Each module is imported in a fresh interpreter, so nothing is cached between
+measurements. The report also lists which heavy UI/network/solver packages
+each import pulled in; the core modules should pull in none of them.
+
+Usage:
+    python bench_import.py [--repeat N]
+
+@author: evan_
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+MODULES: list[str] = [
+    "port_stats",
+    "efrontier",
+    "yfinance_api",
+    "scenarios",
+    "shared_store",
+    "frontier_jobs",
+    "batch",
+    "sharding",
+]
+
+# Modules that should only be imported on first use
+HEAVY_MODULES: list[str] = ["streamlit", "yfinance", "plotly", "scipy.optimize"]
+
+# pandas and numpy are always needed; their import time is the floor
+BASELINE = "pandas, numpy"
+
+_SNIPPET = """
+import sys, time
+t = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - t
+heavy = [m for m in {heavy!r} if m in sys.modules]
+print(f"{{elapsed}}|{{','.join(heavy)}}")
+"""
+
+
+def time_import(module: str) -> tuple[float, list[str]]:
+    """Seconds to import module in a fresh interpreter, and heavy modules loaded."""
+    result = subprocess.run(
+        [sys.executable, "-c", _SNIPPET.format(module=module, heavy=HEAVY_MODULES)],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=os.path.dirname(os.path.abspath(__file__)),  # modules live here
+    )
+    elapsed, heavy = result.stdout.strip().splitlines()[-1].split("|")
+    return float(elapsed), [m for m in heavy.split(",") if m]
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    print(f"{'module':<16}{'median ms':>10}{'min ms':>10}  heavy modules loaded")
+    failed = False
+    for module in [BASELINE] + MODULES:
+        try:
+            runs = [time_import(module) for _ in range(args.repeat)]
+        except subprocess.CalledProcessError as e:
+            print(f"{module:<16}{'error':>10}  {e.stderr.strip().splitlines()[-1]}")
+            failed = True
+            continue
+        times = [t * 1000 for t, _ in runs]
+        heavy = runs[0][1]
+        print(
+            f"{module:<16}{statistics.median(times):>10.1f}{min(times):>10.1f}"
+            f"  {', '.join(heavy) or '-'}"
+        )
+        if module != BASELINE and heavy:
+            failed = True
+    return 1 if failed else 0
+
+
+# ---------------------------------------------------------------------------- #
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+Background calculation of the efficient frontier.
+
+A FrontierJob runs efrontier.iter_efficient_frontier in a worker thread,
+collects the points as they are solved, and can be cancelled between points.
+Nothing in this module depends on Streamlit.
+
+@author: evan_
+"""
+import threading
+from concurrent.futures import Executor, Future
+from typing import Any, Hashable
+import pandas as pd
+import efrontier as ef
+
+
+class FrontierJob:
+    """
+    Efficient frontier calculation running in a background worker.
+
+    Attributes:
+        key (Hashable): identifies the inputs of the calculation
+        columns (list[str]): Risk, Return, Sharpe, tickers
+        total (int): number of points in the frontier, 0 until known
+        error (BaseException | None): exception raised by the calculation
+    """
+
+    def __init__(self, key: Hashable, tickers: list[str]) -> None:
+        self.key = key
+        self.columns: list[str] = ["Risk", "Return", "Sharpe"] + list(tickers)
+        self.total: int = 0
+        self.error: BaseException | None = None
+        self.future: Future | None = None
+        self._points: list[list[float]] = []
+        self._lock = threading.Lock()
+        self._cancel = threading.Event()
+
+    def cancel(self) -> None:
+        """Stop the calculation before the next point is solved."""
+        self._cancel.set()
+        if self.future is not None:
+            self.future.cancel()  # only succeeds if the job has not started
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    @property
+    def done(self) -> bool:
+        return self.future is not None and self.future.done()
+
+    @property
+    def num_points(self) -> int:
+        with self._lock:
+            return len(self._points)
+
+    def get_efficient_frontier(self) -> pd.DataFrame:
+        """
+        Returns the points solved so far, in the same layout as
+        efrontier.get_efficient_frontier.
+        """
+        with self._lock:
+            points = list(self._points)
+        return pd.DataFrame(points, columns=self.columns)
+
+    def run(
+        self,
+        inv_and_constraints: pd.DataFrame,
+        risk_free_rate: float,
+        adj_daily_close: pd.DataFrame,
+        **kwargs: Any,
+    ) -> None:
+        points = ef.iter_efficient_frontier(
+            inv_and_constraints, risk_free_rate, adj_daily_close, **kwargs
+        )
+        try:
+            for eff_fron_point, num_points in points:
+                with self._lock:
+                    self._points.append(eff_fron_point)
+                    self.total = num_points
+                if self._cancel.is_set():
+                    break
+        except Exception as e:
+            self.error = e
+        finally:
+            points.close()
+
+
+def submit_frontier_job(
+    executor: Executor,
+    key: Hashable,
+    inv_and_constraints: pd.DataFrame,
+    risk_free_rate: float,
+    adj_daily_close: pd.DataFrame,
+    **kwargs: Any,
+) -> FrontierJob:
+    """
+    Start calculating the efficient frontier in the background.
+
+    Args:
+        executor (Executor): pool that runs the calculation
+        key (Hashable): identifies the inputs, so callers can tell whether a
+            running job is stale
+        inv_and_constraints, risk_free_rate, adj_daily_close, **kwargs:
+            passed to efrontier.iter_efficient_frontier
+
+    Returns:
+        FrontierJob: handle for progress, partial results and cancellation
+    """
+    job = FrontierJob(key, inv_and_constraints["Ticker"].tolist())
+    job.future = executor.submit(
+        job.run, inv_and_constraints, risk_free_rate, adj_daily_close, **kwargs
+    )
+    return job
@@ -1,19 +1,65 @@
 from typing import Tuple
 
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, timedelta
+from functools import lru_cache
 from dateutil.relativedelta import relativedelta
 import pandas as pd
 import yfinance_api as yf_api
 import streamlit as st
 import port_stats as ps
-import efrontier as ef
-import plotly.express as px
-import plotly.graph_objects as go
+import scenarios
+import frontier_jobs as fj
+import render
+import shared_store as ss
 
 if "init" not in st.session_state:
     st.session_state["init"] = True
     st.session_state["xlsx_selected"] = False
     st.session_state["dates_and_rf_rate_selected"] = False
+    st.session_state["group_constraints"] = pd.DataFrame()
+    st.session_state["prefetch"] = None  # (tickers, Future)
+    st.session_state["frontier_job"] = None
+
+# Prices are prefetched from this date, then sliced to the selected range
+PREFETCH_START = datetime(year=1990, month=1, day=1)
+
+
+@st.cache_resource
+def get_executor() -> ThreadPoolExecutor:
+    """Worker pool shared by all sessions."""
+    return ThreadPoolExecutor(max_workers=os.cpu_count())
+
+
+@st.cache_resource
+def get_shared_store() -> ss.SharedStore:
+    """Price panels and statistics shared, memory-mapped, by all sessions."""
+    return ss.SharedStore()
+
+
+def get_shared(key: str, calc) -> pd.DataFrame:
+    """Return the df stored under key, calculating and storing it if needed."""
+    store = get_shared_store()
+    df = store.get(key)
+    if df is None:
+        df = store.put(key, calc())
+    return df
+
+
+def prefetch_prices(tickers: list[str]) -> None:
+    """Start downloading prices as soon as a scenario is chosen."""
+    prefetch = st.session_state["prefetch"]
+    if prefetch is not None and prefetch[0] == tuple(tickers):
+        return
+    future = get_executor().submit(
+        yf_api.get_adj_daily_close,
+        tickers,
+        PREFETCH_START.date(),
+        datetime.today().date(),
+        get_shared_store(),
+    )
+    st.session_state["prefetch"] = (tuple(tickers), future)
 
 
 def configure_page() -> None:
@@ -36,6 +82,8 @@ def sidebar() -> tuple[pd.DataFrame, pd.DataFrame, datetime, datetime, float]:
 
     def excel_file_selected() -> None:
         st.session_state["xlsx_selected"] = True
+        # A new scenario needs new dates; reruns of the same one keep them
+        st.session_state["dates_and_rf_rate_selected"] = False
 
     def dates_and_rf_rate_selected() -> None:
         st.session_state["dates_and_rf_rate_selected"] = True
@@ -62,33 +110,36 @@ def sidebar() -> tuple[pd.DataFrame, pd.DataFrame, datetime, datetime, float]:
             "Select Scenario", options, index=None, on_change=excel_file_selected
         )
         if opt == options[0]:
-            tickers_and_constraints = pd.read_excel("./data/asset_classes.xlsx")
-            st.session_state["dates_and_rf_rate_selected"] = False
+            scenario = scenarios.load_scenario("./data/asset_classes.xlsx")
+            tickers_and_constraints = scenario.tickers_and_constraints
+            st.session_state["group_constraints"] = scenario.group_constraints
         elif opt == options[1]:
-            tickers_and_constraints = pd.read_excel("./data/industry_sectors.xlsx")
-            st.session_state["dates_and_rf_rate_selected"] = False
+            scenario = scenarios.load_scenario("./data/industry_sectors.xlsx")
+            tickers_and_constraints = scenario.tickers_and_constraints
+            st.session_state["group_constraints"] = scenario.group_constraints
         elif opt == options[2]:
             st.session_state["xlsx_selected"] = False
             tickers_and_constraints, names, start_date, end_date, rf_rate = reset_all()
             f = st.file_uploader("Select Excel File")
             if f:
-                tickers_and_constraints = pd.read_excel(f)
+                scenario = scenarios.load_scenario(f)
+                tickers_and_constraints = scenario.tickers_and_constraints
+                st.session_state["group_constraints"] = scenario.group_constraints
                 st.session_state["xlsx_selected"] = True
         else:
             tickers_and_constraints, names, start_date, end_date, rf_rate = reset_all()
             st.session_state["xlsx_selected"] = False
             st.session_state["dates_and_rf_rate_selected"] = False
-        # Check if all tickers are valid
+        # Check if all tickers are valid (validated once per workbook content)
         if st.session_state["xlsx_selected"]:
-            names = pd.DataFrame()
-            err, names = yf_api.get_investment_names(
-                tickers=tickers_and_constraints["Ticker"].tolist()
-            )
+            err, names = scenario.err, scenario.names
             if err != "":
                 st.error(f"Error! {err}")
                 reset_all()
                 st.session_state["xlsx_selected"] = False
                 st.session_state["dates_and_rf_rate_selected"] = False
+            else:
+                prefetch_prices(tickers_and_constraints["Ticker"].tolist())
 
         if st.session_state["xlsx_selected"]:
             st.markdown("### Step 2: Select Start Date, End Date, & Risk Free Rate")
@@ -109,6 +160,12 @@ def sidebar() -> tuple[pd.DataFrame, pd.DataFrame, datetime, datetime, float]:
                 rf_rate = st.number_input(
                     "Specify Risk-Free Rate", min_value=0.00, value=3.70
                 )
+                st.selectbox(
+                    "Select Return Frequency",
+                    list(ps.PERIODS_PER_YEAR),
+                    index=0,
+                    key="frequency",
+                )
                 calc_ef_button = st.form_submit_button(
                     "Calculate Efficient Frontier", on_click=dates_and_rf_rate_selected
                 )
@@ -117,38 +174,119 @@ def sidebar() -> tuple[pd.DataFrame, pd.DataFrame, datetime, datetime, float]:
                 if end_date < start_date:
                     st.error("Error! Start Date must be less than End Date.")
                     start_date, end_date, rf_rate = reset_start_end_and_rf_rate()
-                    st.session_state["dates_and_rf_rate_entered"] = False
+                    st.session_state["dates_and_rf_rate_selected"] = False
 
         return tickers_and_constraints, names, start_date, end_date, rf_rate
 
 
-@st.cache_data
 def get_data_from_yf(tickers, start, end):
-    adj_daily_close = yf_api.get_adj_daily_close(tickers, start, end)
+    adj_daily_close = yf_api.get_adj_daily_close(
+        tickers, start, end, store=get_shared_store()
+    )
     return adj_daily_close
 
 
-@st.cache_data
-def calc_port_stats(adj_daily_close):
-    growth_of_10000 = ps.get_growth_10000(adj_daily_close)
-    daily_returns = ps.get_daily_returns(adj_daily_close)
-    daily_ln_returns = ps.get_daily_ln_returns(adj_daily_close)
-    correlation_matrix = ps.get_correlation_matrix(daily_ln_returns)
-    expected_returns = ps.get_expected_returns(daily_ln_returns)
-    std_deviations = ps.get_std_deviations(daily_ln_returns)
-    cov_matrix = ps.get_cov_matrix(daily_ln_returns)
-    # inv_cov_matrix = ps.get_inv_cov_matrix(cov_matrix)
-    print(risk_free_rate)
-    efficient_frontier = ef.get_efficient_frontier(
-        tickers_and_constraints, risk_free_rate/100, adj_daily_close
+def get_prices(tickers, start, end) -> pd.DataFrame:
+    """Use the prefetched prices if available, otherwise download them."""
+    prefetch = st.session_state["prefetch"]
+    if prefetch is not None and prefetch[0] == tuple(tickers):
+        future: Future = prefetch[1]
+        try:
+            adj_daily_close = future.result()
+            # end date is exclusive, as for yf.download
+            return adj_daily_close.loc[
+                pd.Timestamp(start) : pd.Timestamp(end) - timedelta(days=1)
+            ]
+        except Exception:
+            pass
+    return get_data_from_yf(tickers, start, end)
+
+
+def get_frontier_job(
+    adj_daily_close,
+    tickers_and_constraints,
+    risk_free_rate,
+    frequency="daily",
+    group_constraints=None,
+) -> fj.FrontierJob:
+    """
+    Return the background job for these inputs, starting it if necessary.
+    A job for different (stale) inputs is cancelled.
+    """
+    key = (
+        tickers_and_constraints.to_json(),
+        str(adj_daily_close.index[0]),
+        str(adj_daily_close.index[-1]),
+        risk_free_rate,
+        frequency,
+        None if group_constraints is None else group_constraints.to_json(),
+    )
+    job: fj.FrontierJob | None = st.session_state["frontier_job"]
+    if job is not None and job.key == key and not job.cancelled:
+        return job
+    if job is not None:
+        job.cancel()
+    job = fj.submit_frontier_job(
+        get_executor(),
+        key,
+        tickers_and_constraints,
+        risk_free_rate / 100,
+        adj_daily_close,
+        frequency=frequency,
+        group_constraints=group_constraints,
+        store=get_shared_store(),
     )
-    efficient_frontier.rename(columns={"Risk": "Std Dev"}, inplace=True)
+    st.session_state["frontier_job"] = job
+    return job
+
+
+def cancel_frontier_job() -> None:
+    job: fj.FrontierJob | None = st.session_state["frontier_job"]
+    if job is not None:
+        job.cancel()
+        st.session_state["frontier_job"] = None
+
+
+def calc_port_stats(adj_daily_close, frequency="daily"):
+    # Large results live in the shared store rather than in st.cache_data,
+    # which would pickle a copy for every session and process. Everything is
+    # keyed on the prices, so reruns for other widgets only read the store.
+    prices_key = ss.get_frame_key("adj_close", adj_daily_close)
+    periods_per_year = ps.PERIODS_PER_YEAR[frequency]
+
+    @lru_cache(maxsize=1)
+    def get_daily_ln_returns() -> pd.DataFrame:
+        adj_close = ps.resample_prices(adj_daily_close, frequency)
+        return ps.get_daily_ln_returns(adj_close)
+
+    growth_of_10000 = get_shared(
+        f"growth_of_10000:{prices_key}",
+        lambda: ps.get_growth_10000(adj_daily_close),
+    )
+    correlation_matrix = get_shared(
+        f"correlation:{frequency}:{prices_key}",
+        lambda: ps.get_correlation_matrix(get_daily_ln_returns()),
+    )
+    return_and_sd = get_shared(
+        f"return_and_sd:{frequency}:{prices_key}",
+        lambda: pd.DataFrame(
+            {
+                "Return": ps.get_expected_returns(
+                    get_daily_ln_returns(), periods_per_year
+                ),
+                "Std Dev": ps.get_std_deviations(
+                    get_daily_ln_returns(), periods_per_year
+                ),
+            }
+        ),
+    )
+    expected_returns = return_and_sd["Return"]
+    std_deviations = return_and_sd["Std Dev"]
     return (
         growth_of_10000,
         expected_returns,
         std_deviations,
         correlation_matrix,
-        efficient_frontier,
     )
 
 
@@ -177,11 +315,40 @@ def display_growth_of_10000_table(tickers_and_constraints, growth_of_10000) -> N
         tickers: list[str] = tickers_and_constraints["Ticker"].tolist()
         # adj_daily_close = yf_api.get_adj_daily_close(tickers, start, end)
         # growth_of_10000 = ps.get_growth_10000(adj_daily_close)
-        columns = growth_of_10000.columns
-        format_dict: dict[str, str] = {}
-        for c in columns:
-            format_dict[c] = "${:,.2f}"
-        st.dataframe(growth_of_10000.style.format(formatter=format_dict))
+        # Show one page at a time, formatted by the browser instead of a Styler
+        page = st.number_input(
+            "Page",
+            min_value=1,
+            max_value=render.num_pages(growth_of_10000),
+            value=1,
+            key="growth_of_10000_page",
+        )
+        column_config = {
+            c: st.column_config.NumberColumn(format="$%.2f")
+            for c in growth_of_10000.columns
+        }
+        st.dataframe(
+            render.get_page(growth_of_10000, page), column_config=column_config
+        )
+
+
+@st.cache_data
+def get_growth_of_10000_figure(
+    growth_of_10000: pd.DataFrame, legend_title: str
+) -> dict:
+    """Downsampled growth of $10,000 chart, cached in serialized form."""
+    fig = render.line_figure(growth_of_10000)
+    fig.update_layout(
+        title="Growth of $10,000",
+        title_font_size=24,
+        # title_x=0.5,
+        legend_title=legend_title,
+        autosize=True,
+        height=800,
+        yaxis_tickprefix="$",
+        yaxis_tickformat=",",
+    )
+    return fig.to_dict()
 
 
 def display_growth_of_10000_graph(
@@ -191,33 +358,15 @@ def display_growth_of_10000_graph(
         tickers: list[str] = tickers_and_constraints["Ticker"].tolist()
         # adj_daily_close = yf_api.get_adj_daily_close(tickers, start, end)
         # growth_of_10000 = ps.get_growth_10000(adj_daily_close)
-        columns = growth_of_10000.columns
-        format_dict: dict[str, str] = {}
-        for c in columns:
-            format_dict[c] = "${:,.2f}"
-        fig = px.line(
-            growth_of_10000,
-            x=growth_of_10000.index,
-            y=growth_of_10000.columns[0 : len(growth_of_10000.columns)],
-            title="Growth of $10,000",
-            # color="Ticker"
-        )
-        fig.update_layout(
-            title="Growth of $10,000",
-            title_font_size=24,
-            # title_x=0.5,
-            legend_title="Investment",
-            autosize=True,
-            height=800,
-            yaxis_tickprefix="$",
-            yaxis_tickformat=",",
-        )
+        fig = get_growth_of_10000_figure(growth_of_10000, "Investment")
         st.plotly_chart(fig, use_container_width=True)
 
 
 def display_return_and_sd_table_and_graph(
     names, expected_returns, std_deviations
 ) -> None:
+    import plotly.graph_objects as go
+
     with st.expander(
         "Expected Return & Standard Deviation (Click to Hide / Show)", expanded=True
     ):
@@ -268,6 +417,8 @@ def display_return_and_sd_table_and_graph(
 
 
 def display_correlation_matrix(cm: pd.DataFrame) -> None:
+    import plotly.graph_objects as go
+
     with st.expander(
         "Investment Correlation Matrix (Click to Hide / Show)", expanded=True
     ):
@@ -302,6 +453,8 @@ def display_correlation_matrix(cm: pd.DataFrame) -> None:
 
 
 def display_efficient_frontier(ef: pd.DataFrame):
+    import plotly.graph_objects as go
+
     st.markdown("##### Efficient Frontier")
     st.dataframe(ef)
     col1, col2 = st.columns(2)
@@ -328,6 +481,62 @@ def display_efficient_frontier(ef: pd.DataFrame):
         st.write("Display Portfolio for Selected Point on Efficient Frontier")
 
 
+@st.fragment(run_every=0.5)
+def display_frontier_progress(job: fj.FrontierJob) -> None:
+    if job.done:
+        st.rerun()  # Render the finished frontier with the rest of the app
+    num_points = job.num_points
+    if job.total:
+        st.progress(
+            num_points / job.total,
+            text=f"Calculating Efficient Frontier: {num_points} of {job.total} points",
+        )
+    else:
+        st.progress(0.0, text="Calculating Efficient Frontier...")
+    if num_points > 0:
+        efficient_frontier = job.get_efficient_frontier()
+        efficient_frontier.rename(columns={"Risk": "Std Dev"}, inplace=True)
+        display_efficient_frontier(efficient_frontier)
+
+
+def display_frontier_growth_of_10000(
+    efficient_frontier: pd.DataFrame, adj_daily_close: pd.DataFrame
+) -> None:
+    with st.expander(
+        "Growth of $10,000 for Efficient Frontier Portfolios (Click to Hide / Show)",
+        expanded=True,
+    ):
+        options: dict[str, str | None] = {
+            "Buy & Hold": None,
+            "Monthly": "monthly",
+            "Quarterly": "quarterly",
+            "Annually": "annually",
+        }
+        opt = st.radio("Rebalancing", list(options), horizontal=True)
+        growth = ps.get_frontier_growth_10000(
+            efficient_frontier, adj_daily_close, rebalance=options[opt]
+        )
+        growth.columns = [f"Portfolio {i}" for i in growth.columns]
+        fig = get_growth_of_10000_figure(growth, "Portfolio")
+        st.plotly_chart(fig, use_container_width=True)
+
+        st.markdown("##### Ex-Ante vs Realized")
+        df = ps.get_backtest_stats(growth)
+        df.insert(0, "Std Dev", efficient_frontier["Std Dev"].to_numpy())
+        df.insert(0, "Return", efficient_frontier["Return"].to_numpy())
+        st.dataframe(
+            df.style.format(
+                {
+                    "Return": "{:.2%}",
+                    "Std Dev": "{:.2%}",
+                    "Realized Return": "{:.2%}",
+                    "Realized Std Dev": "{:.2%}",
+                    "Max Drawdown": "{:.2%}",
+                }
+            )
+        )
+
+
 if __name__ == "__main__":
     configure_page()
     overview()
@@ -338,21 +547,38 @@ if __name__ == "__main__":
         and st.session_state["dates_and_rf_rate_selected"]
     ):
         display_configuration(tickers_and_constraints, names)
-        adj_daily_close = get_data_from_yf(
+        adj_daily_close = get_prices(
             tickers_and_constraints["Ticker"].tolist(), start, end
         )
+        # Start the frontier first so it is solved while the rest is rendered
+        job = get_frontier_job(
+            adj_daily_close,
+            tickers_and_constraints,
+            risk_free_rate,
+            st.session_state["frequency"],
+            st.session_state["group_constraints"],
+        )
         (
             growth_of_10000,
             expected_returns,
             std_deviations,
             correlation_matrix,
-            efficient_frontier,
-        ) = calc_port_stats(adj_daily_close)
+        ) = calc_port_stats(adj_daily_close, st.session_state["frequency"])
         display_growth_of_10000_table(tickers_and_constraints, growth_of_10000)
         display_growth_of_10000_graph(tickers_and_constraints, growth_of_10000)
         display_return_and_sd_table_and_graph(names, expected_returns, std_deviations)
         display_correlation_matrix(correlation_matrix)
-        display_efficient_frontier(efficient_frontier)
+        if not job.done:
+            display_frontier_progress(job)
+        elif job.error is not None:
+            st.error(f"Error! {job.error}")
+        else:
+            efficient_frontier = job.get_efficient_frontier()
+            efficient_frontier.rename(columns={"Risk": "Std Dev"}, inplace=True)
+            display_efficient_frontier(efficient_frontier)
+            display_frontier_growth_of_10000(efficient_frontier, adj_daily_close)
+    else:
+        cancel_frontier_job()
     # err, names = yf_api.get_investment_names(tickers)
     # if err != "":
     #     print(err)
@@ -4,19 +4,164 @@ Created on Wed Jun  5 11:26:12 2024
 
 @author: evan_
 """
-from typing import Any
+from typing import Any, TYPE_CHECKING
 from numpy.typing import NDArray
 
 # from typing import TypeVar
 import pandas as pd
 import numpy as np
 
+if TYPE_CHECKING:
+    from shared_store import SharedStore
+
+# Number of return periods per year for each supported return frequency
+PERIODS_PER_YEAR: dict[str, int] = {"daily": 252, "weekly": 52, "monthly": 12}
+
+# pandas resample rule for each frequency lower than daily
+_RESAMPLE_RULES: dict[str, str] = {"weekly": "W-FRI", "monthly": "ME"}
+
+
+def resample_prices(adj_close: pd.DataFrame, frequency: str = "daily") -> pd.DataFrame:
+    """
+    Resamples a panel of daily closing prices to a lower return frequency.
+
+    The last available close in each period is used. Resampling is done once,
+    on prices, so all statistics derived from the result are consistent.
+
+    Args:
+        adj_close (pd.DataFrame):
+            column headings: investment tickers
+            row headings: dates
+            table content: adjusted daily close
+        frequency (str): "daily", "weekly" or "monthly"
+
+    Returns:
+        df (pd.DataFrame):
+            column headings: investment tickers
+            row headings: last date of each period
+            table content: adjusted close at the end of each period
+    """
+    if frequency not in PERIODS_PER_YEAR:
+        raise ValueError(
+            f"Invalid frequency: {frequency}. Must be one of {list(PERIODS_PER_YEAR)}"
+        )
+    if frequency == "daily":
+        return adj_close
+    df = adj_close.resample(_RESAMPLE_RULES[frequency]).last()
+    df = df.dropna(how="all")
+    return df
+
 
 def get_growth_10000(adj_close: pd.DataFrame) -> pd.DataFrame:
     df = adj_close.div(adj_close.iloc[0]) * 10000
     return df
 
 
+# pandas period alias for each supported rebalancing frequency
+_REBALANCE_PERIODS: dict[str, str] = {
+    "monthly": "M",
+    "quarterly": "Q",
+    "annually": "Y",
+}
+
+
+def get_frontier_growth_10000(
+    eff_fron: pd.DataFrame,
+    adj_close: pd.DataFrame,
+    rebalance: str | None = None,
+) -> pd.DataFrame:
+    """
+    Calculates the growth of $10,000 for every portfolio in the efficient frontier.
+
+    All portfolios are evaluated together: the price relatives of the
+    investments are multiplied by the frontier weight matrix in one matrix
+    product.
+
+    Args:
+        eff_fron (pd.DataFrame): efficient frontier as returned by
+            efrontier.get_efficient_frontier. Every column that is also a column
+            of adj_close is treated as a portfolio weight.
+        adj_close (pd.DataFrame):
+            column headings: investment tickers
+            row headings: dates
+            table content: adjusted daily close
+        rebalance (str | None): None for buy-and-hold, or "monthly",
+            "quarterly" or "annually" to reset the portfolios to their
+            frontier weights at the last close of each period.
+
+    Returns:
+        df (pd.DataFrame):
+            column headings: efficient frontier row labels
+            row headings: dates
+            table content: value of $10,000 invested in each portfolio
+    """
+    tickers = [c for c in eff_fron.columns if c in adj_close.columns]
+    prices = adj_close[tickers].dropna()
+    weights = eff_fron[tickers].to_numpy(dtype=float)  # portfolios x tickers
+    p = prices.to_numpy(dtype=float)  # dates x tickers
+
+    if rebalance is None:
+        growth = (p / p[0]) @ weights.T
+    else:
+        if rebalance not in _REBALANCE_PERIODS:
+            raise ValueError(
+                f"Invalid rebalance: {rebalance}. "
+                f"Must be None or one of {list(_REBALANCE_PERIODS)}"
+            )
+        periods = prices.index.to_period(_REBALANCE_PERIODS[rebalance])
+        codes, _ = pd.factorize(periods)
+        # Last row of each period; the portfolios are rebalanced at that close
+        period_end = np.flatnonzero(np.r_[codes[1:] != codes[:-1], True])
+        # Each period grows from the close at the end of the previous period
+        base_rows = np.r_[0, period_end[:-1]]
+        growth = (p / p[base_rows[codes]]) @ weights.T
+        # Carry the value reached at the end of each earlier period forward
+        period_growth = growth[period_end]
+        carried = np.vstack(
+            [np.ones((1, len(weights))), np.cumprod(period_growth, axis=0)[:-1]]
+        )
+        growth = growth * carried[codes]
+
+    df = pd.DataFrame(growth * 10000, index=prices.index, columns=eff_fron.index)
+    return df
+
+
+def get_backtest_stats(
+    growth_of_10000: pd.DataFrame, periods_per_year: int = 252
+) -> pd.DataFrame:
+    """
+    Calculates realized statistics of growth-of-$10,000 paths.
+
+    Args:
+        growth_of_10000 (pd.DataFrame):
+            column headings: portfolios or tickers
+            row headings: dates
+            table content: value of $10,000 invested
+        periods_per_year (int): number of rows per year in growth_of_10000
+
+    Returns:
+        df (pd.DataFrame):
+            column headings: Realized Return, Realized Std Dev, Max Drawdown
+            row headings: portfolios or tickers
+            table content: annualized return, annualized standard deviation
+                of log returns, largest peak-to-trough decline
+    """
+    values = growth_of_10000.to_numpy(dtype=float)
+    ln_returns = np.diff(np.log(values), axis=0)
+    realized_return = np.exp(ln_returns.mean(axis=0) * periods_per_year) - 1
+    realized_sd = ln_returns.std(axis=0, ddof=1) * np.sqrt(periods_per_year)
+    max_drawdown = (values / np.maximum.accumulate(values, axis=0) - 1).min(axis=0)
+    df = pd.DataFrame(
+        {
+            "Realized Return": realized_return,
+            "Realized Std Dev": realized_sd,
+            "Max Drawdown": max_drawdown,
+        },
+        index=growth_of_10000.columns,
+    )
+    return df
+
+
 def get_daily_returns(adj_close: pd.DataFrame) -> pd.DataFrame:
     df = (adj_close / adj_close.shift(1)) - 1
     df = df.dropna()
@@ -42,7 +187,9 @@ def get_correlation_matrix(daily_ln_returns: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
-def get_expected_returns(daily_ln_returns: pd.DataFrame) -> pd.Series:
+def get_expected_returns(
+    daily_ln_returns: pd.DataFrame, periods_per_year: int = 252
+) -> pd.Series:
     """
     Calculates the covariance of the specified investments.
 
@@ -51,17 +198,21 @@ def get_expected_returns(daily_ln_returns: pd.DataFrame) -> pd.Series:
             column headings: investment tickers
             row headings: dates
             table content: log normal return of investment vs previous day close
+        periods_per_year (int): number of return periods in a year
+            (252 for daily returns, 52 for weekly, 12 for monthly)
 
     Returns:
         df (pd.Series):
             row headings: investment tickers
             table content: annual expected return of investment
     """
-    df = np.exp(daily_ln_returns.mean() * 252) - 1
+    df = np.exp(daily_ln_returns.mean() * periods_per_year) - 1
     return df
 
 
-def get_std_deviations(daily_ln_returns: pd.DataFrame) -> pd.Series:
+def get_std_deviations(
+    daily_ln_returns: pd.DataFrame, periods_per_year: int = 252
+) -> pd.Series:
     """
     Calculates the covariance of the specified investments.
 
@@ -70,17 +221,21 @@ def get_std_deviations(daily_ln_returns: pd.DataFrame) -> pd.Series:
             column headings: investment tickers
             row headings: dates
             table content: log normal return of investment vs previous day close
+        periods_per_year (int): number of return periods in a year
+            (252 for daily returns, 52 for weekly, 12 for monthly)
 
     Returns:
         df (pd.Series):
             row headings: investment tickers
             table content: standard deviation of investment
     """
-    df = daily_ln_returns.std() * np.sqrt(252)
+    df = daily_ln_returns.std() * np.sqrt(periods_per_year)
     return df
 
 
-def get_cov_matrix(daily_ln_returns: pd.DataFrame) -> pd.DataFrame:
+def get_cov_matrix(
+    daily_ln_returns: pd.DataFrame, store: "SharedStore | None" = None
+) -> pd.DataFrame:
     """
     Calculates the covariance of the specified investments.
 
@@ -89,6 +244,9 @@ def get_cov_matrix(daily_ln_returns: pd.DataFrame) -> pd.DataFrame:
             column headings: investment tickers
             row headings: dates
             table content: log normal return of investment vs previous day close
+        store (SharedStore | None): if specified, the covariance matrix is
+            read from / added to this shared store, keyed by the content of
+            daily_ln_returns, and the returned df is memory-mapped read-only
 
     Returns:
         df (pd.DataFrame):
@@ -96,6 +254,14 @@ def get_cov_matrix(daily_ln_returns: pd.DataFrame) -> pd.DataFrame:
             row headings: investment tickers
             table content: covariances
     """
+    if store is not None:
+        from shared_store import get_frame_key
+
+        key = get_frame_key("cov", daily_ln_returns)
+        df = store.get(key)
+        if df is None:
+            df = store.put(key, daily_ln_returns.cov())
+        return df
     df = daily_ln_returns.cov()
     return df
 
@@ -103,3 +269,130 @@ def get_cov_matrix(daily_ln_returns: pd.DataFrame) -> pd.DataFrame:
 def get_inv_cov_matrix(cov_matrix: Any) -> Any:
     df = np.linalg.inv(cov_matrix)
     return df
+
+
+# ---------------------------------------------------------------------------- #
+# Pairwise-complete statistics for tickers with different history lengths.
+#
+# get_daily_ln_returns drops every row with a missing value, so one recently
+# listed ticker truncates the whole panel. The functions below keep the NaNs
+# and compute each statistic over the history that is actually available.
+# ---------------------------------------------------------------------------- #
+def get_pairwise_daily_ln_returns(adj_close: pd.DataFrame) -> pd.DataFrame:
+    """
+    Calculates daily log returns without discarding rows that are incomplete.
+
+    Only rows in which every ticker is missing are dropped. Dates before a
+    ticker was listed remain NaN.
+
+    Args:
+        adj_close (pd.DataFrame):
+            column headings: investment tickers
+            row headings: dates
+            table content: adjusted daily close (NaN where not available)
+
+    Returns:
+        df (pd.DataFrame):
+            column headings: investment tickers
+            row headings: dates
+            table content: log normal return of investment vs previous day close
+    """
+    df = np.log((adj_close / adj_close.shift(1)))
+    df = df.dropna(how="all")
+    return df
+
+
+def get_pairwise_cov_matrix(
+    daily_ln_returns: pd.DataFrame, min_periods: int = 2
+) -> pd.DataFrame:
+    """
+    Calculates pairwise-complete covariances of the specified investments.
+
+    Each covariance is computed over the dates on which both investments have
+    a return. All pairs are evaluated together with three matrix products on
+    the masked return panel.
+
+    Args:
+        daily_ln_returns (pd.DataFrame):
+            column headings: investment tickers
+            row headings: dates
+            table content: log normal return of investment (NaN if missing)
+        min_periods (int): minimum number of overlapping returns for a pair.
+            Pairs with fewer observations get a covariance of 0.
+
+    Returns:
+        df (pd.DataFrame):
+            column headings: investment tickers
+            row headings: investment tickers
+            table content: covariances
+    """
+    x = daily_ln_returns.to_numpy(dtype=float)
+    mask = ~np.isnan(x)
+    x = np.where(mask, x, 0.0)
+    m = mask.astype(float)
+
+    n = m.T @ m  # overlapping observations for each pair
+    sum_x = x.T @ m  # sum_x[i, j]: sum of x_i over dates where x_j exists
+    sum_xx = x.T @ x
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cov = (sum_xx - sum_x * sum_x.T / n) / (n - 1)
+    cov = np.where(n >= max(min_periods, 2), cov, 0.0)
+
+    df = pd.DataFrame(
+        cov, index=daily_ln_returns.columns, columns=daily_ln_returns.columns
+    )
+    return df
+
+
+def get_nearest_psd_matrix(cov_matrix: pd.DataFrame, eps: float = 1e-12) -> pd.DataFrame:
+    """
+    Repairs a covariance matrix that is not positive semi-definite.
+
+    Pairwise-complete covariances are estimated over different date ranges
+    and can have negative eigenvalues, which prevents the optimizers from
+    converging. The matrix is symmetrized and its eigenvalues are clipped at
+    a small positive floor. The original variances are restored afterwards.
+
+    Args:
+        cov_matrix (pd.DataFrame): covariance matrix (tickers x tickers)
+        eps (float): floor for the eigenvalues, relative to the largest one
+
+    Returns:
+        df (pd.DataFrame): positive semi-definite covariance matrix
+    """
+    a = cov_matrix.to_numpy(dtype=float)
+    a = (a + a.T) / 2
+    eigvals, eigvecs = np.linalg.eigh(a)
+    floor = eps * max(eigvals.max(), 0.0)
+    if eigvals.min() >= floor:
+        return pd.DataFrame(a, index=cov_matrix.index, columns=cov_matrix.columns)
+
+    eigvals = np.clip(eigvals, floor, None)
+    psd = (eigvecs * eigvals) @ eigvecs.T
+
+    # Rescale so the diagonal (the variances) is unchanged
+    d = np.sqrt(np.diag(a) / np.diag(psd))
+    d = np.where(np.isfinite(d), d, 1.0)
+    psd = psd * np.outer(d, d)
+    psd = (psd + psd.T) / 2
+
+    df = pd.DataFrame(psd, index=cov_matrix.index, columns=cov_matrix.columns)
+    return df
+
+
+def get_pairwise_correlation_matrix(cov_matrix: pd.DataFrame) -> pd.DataFrame:
+    """
+    Calculates the correlation matrix implied by a covariance matrix.
+
+    Args:
+        cov_matrix (pd.DataFrame): covariance matrix (tickers x tickers)
+
+    Returns:
+        df (pd.DataFrame): correlation matrix (tickers x tickers)
+    """
+    sd = np.sqrt(np.diag(cov_matrix.to_numpy(dtype=float)))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        corr = cov_matrix.to_numpy(dtype=float) / np.outer(sd, sd)
+    df = pd.DataFrame(corr, index=cov_matrix.index, columns=cov_matrix.columns)
+    return df
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+Rendering helpers for long histories and many tickers.
+
+Line charts are downsampled with Largest-Triangle-Three-Buckets (LTTB) to a
+fixed point budget, which keeps the visual shape of each series while
+limiting the size of the figure sent to the browser. Large figures use WebGL
+(Scattergl) traces.
+
+@author: evan_
+"""
+from typing import Any, TYPE_CHECKING
+from numpy.typing import NDArray
+import numpy as np
+import pandas as pd
+
+if TYPE_CHECKING:
+    import plotly.graph_objects as go
+
+# Points kept per trace; roughly 2 per horizontal pixel of a wide chart
+MAX_POINTS_PER_TRACE: int = 2000
+
+# Above this many points in a figure, use WebGL traces
+WEBGL_THRESHOLD: int = 10000
+
+# Rows per page of a paginated table
+TABLE_PAGE_SIZE: int = 500
+
+
+# ---------------------------------------------------------------------------- #
+def lttb_indices(x: NDArray, y: NDArray, n_out: int) -> NDArray:
+    """
+    Selects points with Largest-Triangle-Three-Buckets downsampling.
+
+    All series share the same x values, so the buckets are the same for every
+    series and each bucket is evaluated for all series at once.
+
+    Args:
+        x (NDArray): x values, shape (n,), increasing
+        y (NDArray): y values, shape (n, k), one column per series
+        n_out (int): number of points to keep per series
+
+    Returns:
+        NDArray: row indices of the points kept, shape (n_out, k)
+    """
+    n, k = y.shape
+    if n_out >= n or n_out < 3:
+        return np.repeat(np.arange(n)[:, None], k, axis=1)
+
+    # n_out - 2 buckets between the first and the last point
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    edges = np.append(edges, n)  # "next bucket" of the last bucket is point n-1
+    cols = np.arange(k)
+    out = np.empty((n_out, k), dtype=int)
+    out[0] = 0
+    out[-1] = n - 1
+    a = np.zeros(k, dtype=int)
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_lo, next_hi = edges[i + 1], edges[i + 2]
+        avg_x = x[next_lo:next_hi].mean()
+        avg_y = y[next_lo:next_hi].mean(axis=0)
+        ax = x[a]
+        ay = y[a, cols]
+        area = np.abs(
+            (ax - avg_x) * (y[lo:hi] - ay) - (ax - x[lo:hi, None]) * (avg_y - ay)
+        )
+        area = np.where(np.isnan(area), -1.0, area)
+        a = lo + np.argmax(area, axis=0)
+        out[i + 1] = a
+    return out
+
+
+def downsample(
+    df: pd.DataFrame, max_points: int = MAX_POINTS_PER_TRACE
+) -> dict[Any, pd.Series]:
+    """
+    Downsamples every column of df with LTTB.
+
+    Args:
+        df (pd.DataFrame): one series per column, index is the x axis
+        max_points (int): points kept per series
+
+    Returns:
+        dict: column label -> downsampled pd.Series
+    """
+    if len(df) <= max_points:
+        return {c: df[c] for c in df.columns}
+    if isinstance(df.index, pd.DatetimeIndex):
+        x = df.index.asi8.astype(float)
+    else:
+        x = np.arange(len(df), dtype=float)
+    y = df.to_numpy(dtype=float)
+    idx = lttb_indices(x, y, max_points)
+    return {c: df[c].iloc[idx[:, j]] for j, c in enumerate(df.columns)}
+
+
+def line_figure(
+    df: pd.DataFrame,
+    max_points: int = MAX_POINTS_PER_TRACE,
+    webgl_threshold: int = WEBGL_THRESHOLD,
+) -> "go.Figure":
+    """
+    Line chart with one trace per column of df, downsampled to max_points per
+    trace. WebGL traces are used when the figure has more than
+    webgl_threshold points.
+    """
+    import plotly.graph_objects as go
+
+    series = downsample(df, max_points)
+    num_points = sum(len(s) for s in series.values())
+    trace = go.Scattergl if num_points > webgl_threshold else go.Scatter
+    fig = go.Figure(
+        [
+            trace(x=s.index, y=s.to_numpy(), name=str(c), mode="lines")
+            for c, s in series.items()
+        ]
+    )
+    return fig
+
+
+def get_page(
+    df: pd.DataFrame, page: int, page_size: int = TABLE_PAGE_SIZE
+) -> pd.DataFrame:
+    """Rows of df on the 1-based page."""
+    start = (page - 1) * page_size
+    return df.iloc[start : start + page_size]
+
+
+def num_pages(df: pd.DataFrame, page_size: int = TABLE_PAGE_SIZE) -> int:
+    return max(1, -(-len(df) // page_size))
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+Reading of scenario workbooks (tickers, weight constraints, group limits).
+
+@author: evan_
+"""
+import hashlib
+import io
+import os
+import pickle
+import threading
+from pathlib import Path
+from typing import NamedTuple
+import pandas as pd
+
+GROUP_CONSTRAINTS_SHEET = "Group Constraints"
+
+
+# ---------------------------------------------------------------------------- #
+def read_scenario(f) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Read tickers & constraints, and the optional group exposure limits.
+
+    Args:
+        f: path or file-like object of the Excel workbook
+
+    Returns:
+        pd.DataFrame:
+            First sheet of the workbook.
+            Column Heading(s): Ticker, Min Weight, Max Weight and any group
+            columns (e.g. Asset Class, Sector, Region)
+        pd.DataFrame:
+            "Group Constraints" sheet, empty df if the workbook has none.
+            Column Heading(s): Group Type, Group, Min Weight, Max Weight
+    """
+    sheets = pd.read_excel(f, sheet_name=None)
+    tickers_and_constraints = next(iter(sheets.values()))
+    group_constraints = sheets.get(GROUP_CONSTRAINTS_SHEET, pd.DataFrame())
+    return tickers_and_constraints, group_constraints
+
+
+# ---------------------------------------------------------------------------- #
+# Scenario registry
+#
+# Parsing a workbook with openpyxl and validating every ticker online is slow,
+# so each workbook is processed once and the result is cached by the SHA-256
+# of its content: in memory for the running process, and as a pickle in
+# CACHE_DIR for other processes and restarts. A changed workbook has a
+# different hash, so stale entries are never used.
+# ---------------------------------------------------------------------------- #
+CACHE_DIR = Path(".cache") / "scenarios"
+
+
+class Scenario(NamedTuple):
+    """Parsed and validated scenario workbook."""
+
+    tickers_and_constraints: pd.DataFrame
+    group_constraints: pd.DataFrame
+    names: pd.DataFrame  # longName by ticker, see yfinance_api.get_investment_names
+    err: str  # empty string if all tickers are valid
+    digest: str = ""  # SHA-256 of the workbook content
+
+
+_scenarios: dict[str, Scenario] = {}  # content hash -> Scenario
+_unvalidated: dict[str, Scenario] = {}  # content hash -> Scenario, names not checked
+_path_hashes: dict[tuple[str, int, int], str] = {}  # (path, mtime, size) -> hash
+
+
+def _get_content(f) -> tuple[bytes | None, str]:
+    """Return the workbook bytes (None if a known path is unchanged) and hash."""
+    if hasattr(f, "getvalue"):  # uploaded file
+        content = f.getvalue()
+        return content, hashlib.sha256(content).hexdigest()
+    stat = os.stat(f)
+    path_key = (os.path.abspath(f), stat.st_mtime_ns, stat.st_size)
+    if path_key in _path_hashes:
+        return None, _path_hashes[path_key]
+    content = Path(f).read_bytes()
+    digest = hashlib.sha256(content).hexdigest()
+    _path_hashes[path_key] = digest
+    return content, digest
+
+
+def _copy(scenario: Scenario, digest: str) -> Scenario:
+    # Callers modify these dfs in place, so never hand out the cached objects
+    return Scenario(
+        scenario.tickers_and_constraints.copy(),
+        scenario.group_constraints.copy(),
+        scenario.names.copy(),
+        scenario.err,
+        digest,
+    )
+
+
+def load_scenario(f, validate: bool = True) -> Scenario:
+    """
+    Parse and validate a scenario workbook, using the cached result if the
+    same content was loaded before.
+
+    Args:
+        f: path or uploaded file (any object with getvalue()) of the workbook
+        validate (bool): retrieve investment names, which checks that every
+            ticker is valid
+
+    Returns:
+        Scenario: tickers & constraints, group constraints, investment names,
+            error message (empty string if no errors) and content hash
+    """
+    content, digest = _get_content(f)
+    if digest in _scenarios:
+        return _copy(_scenarios[digest], digest)
+
+    cache_file = CACHE_DIR / f"{digest}.pkl"
+    if cache_file.exists():
+        with open(cache_file, "rb") as fh:
+            scenario = pickle.load(fh)
+        _scenarios[digest] = scenario
+        return _copy(scenario, digest)
+
+    if not validate and digest in _unvalidated:
+        return _copy(_unvalidated[digest], digest)
+
+    if content is None:
+        content = Path(f).read_bytes()
+    tickers_and_constraints, group_constraints = read_scenario(io.BytesIO(content))
+    if not validate:
+        scenario = Scenario(
+            tickers_and_constraints, group_constraints, pd.DataFrame(), "", digest
+        )
+        _unvalidated[digest] = scenario
+        return _copy(scenario, digest)
+
+    import yfinance_api as yf_api
+
+    err, names = yf_api.get_investment_names(
+        tickers=tickers_and_constraints["Ticker"].tolist()
+    )
+    scenario = Scenario(
+        tickers_and_constraints, group_constraints, names, err, digest
+    )
+    if err != "":
+        return scenario  # don't cache failures; they may be temporary
+
+    _scenarios[digest] = scenario
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    # One temporary file per writer; sessions are threads of one process
+    suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+    tmp = cache_file.with_name(cache_file.name + suffix)
+    with open(tmp, "wb") as fh:
+        pickle.dump(scenario, fh, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, cache_file)
+    return _copy(scenario, digest)
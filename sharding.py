@@ -0,0 +1,534 @@
+# -*- coding: utf-8 -*-
+"""
+Sharded execution of efficient frontier batches across several workers/nodes.
+
+Every combination of scenario workbook and date window is a work unit. Units
+are assigned to a fixed number of shards by a hash of the unit, so every
+worker computes the same plan without talking to the others. Workers claim
+whole shards through a coordinator, write one output file per shard, and a
+merge step combines the shard files.
+
+Coordinators:
+    FileLockCoordinator: lock files in a shared directory (e.g. NFS)
+    SqliteCoordinator: a SQLite database, for local runs and tests
+
+Shard outputs are written atomically and a shard whose output already exists
+is never recomputed, so workers can be restarted or run twice safely. The
+output directory records the plan (parameters, work units and the SHA-256 of
+every workbook) in plan.json; workers and the merge refuse to use a directory
+written for another plan. A shard that fails is released so that another
+worker can claim it.
+
+Example:
+    python sharding.py worker data/asset_classes.xlsx data/industry_sectors.xlsx \\
+        --window 2007-05-29:2015-05-29 --window 2015-05-29:2023-05-20 \\
+        --shards 16 --output shards --coordinator sqlite
+    python sharding.py merge --shards 16 --output shards
+
+@author: evan_
+"""
+import argparse
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import sys
+import time
+from functools import partial
+from pathlib import Path
+from typing import Callable, NamedTuple, Protocol
+import pandas as pd
+import port_stats as ps
+import efrontier as ef
+from batch import get_prices, PROVIDERS
+from scenarios import load_scenario
+
+# A claimed shard that is not completed within this time can be claimed again
+DEFAULT_LEASE_SECONDS: float = 6 * 60 * 60
+
+PLAN_FILE = "plan.json"
+
+
+class WorkUnit(NamedTuple):
+    """One efficient frontier calculation: scenario workbook x date window."""
+
+    scenario: str
+    start: str
+    end: str
+
+
+def get_shard(unit: WorkUnit, num_shards: int) -> int:
+    """Shard of a work unit; stable across processes, hosts and runs."""
+    key = f"{unit.scenario}|{unit.start}|{unit.end}".encode()
+    return int(hashlib.sha256(key).hexdigest()[:16], 16) % num_shards
+
+
+def plan_shards(units: list[WorkUnit], num_shards: int) -> list[list[WorkUnit]]:
+    """Work units of each shard, in a deterministic order."""
+    shards: list[list[WorkUnit]] = [[] for _ in range(num_shards)]
+    for unit in sorted(set(units)):
+        shards[get_shard(unit, num_shards)].append(unit)
+    return shards
+
+
+def shard_file(out_dir: Path, shard: int) -> Path:
+    return out_dir / f"shard-{shard:05d}.jsonl"
+
+
+def get_plan(
+    units: list[WorkUnit], num_shards: int, args: argparse.Namespace
+) -> dict:
+    """
+    Parameters, work units and workbook contents that determine the shard
+    outputs, with their hash as plan_id.
+    """
+    plan = {
+        "num_shards": num_shards,
+        "workbooks": {
+            scenario: load_scenario(scenario, validate=False).digest
+            for scenario in sorted({unit.scenario for unit in units})
+        },
+        "risk_free_rate": args.risk_free_rate,
+        "frequency": args.frequency,
+        "pairwise": args.pairwise,
+        "provider": args.provider,
+        "prices_csv": args.prices_csv,
+        "units": [list(unit) for unit in sorted(set(units))],
+    }
+    content = json.dumps(plan, sort_keys=True).encode()
+    plan["plan_id"] = hashlib.sha256(content).hexdigest()
+    return plan
+
+
+def check_plan(out_dir: Path, plan: dict) -> None:
+    """
+    Record plan in out_dir, or check that out_dir was written for the same
+    plan. Raises ValueError if it was not.
+    """
+    out_dir.mkdir(parents=True, exist_ok=True)
+    manifest = out_dir / PLAN_FILE
+    if not manifest.exists():
+        leftovers = (
+            any(out_dir.glob("shard-*.jsonl"))
+            or (out_dir / "locks").exists()
+            or (out_dir / "coordinator.db").exists()
+        )
+        if leftovers and not manifest.exists():
+            raise ValueError(
+                f"{out_dir} has shard outputs without a {PLAN_FILE}; "
+                "use a new output directory"
+            )
+        # Link a complete file into place; only the first worker succeeds
+        tmp = out_dir / f"{PLAN_FILE}.{get_worker_id().replace(':', '_')}.tmp"
+        tmp.write_text(json.dumps(plan, indent=1))
+        try:
+            os.link(tmp, manifest)
+        except FileExistsError:
+            pass
+        finally:
+            tmp.unlink()
+    recorded = json.loads(manifest.read_text())
+    if recorded["plan_id"] != plan["plan_id"]:
+        raise ValueError(
+            f"{out_dir} was written for another plan (parameters, windows, "
+            "workbooks or number of shards); use a new output directory"
+        )
+
+
+# ---------------------------------------------------------------------------- #
+# Coordinators
+# ---------------------------------------------------------------------------- #
+class Coordinator(Protocol):
+    def claim(self, shard: int, worker: str) -> bool:
+        """Try to claim shard for worker. True if the worker now owns it."""
+        ...
+
+    def complete(self, shard: int, worker: str) -> None:
+        """Mark a claimed shard as finished."""
+        ...
+
+    def release(self, shard: int, worker: str) -> None:
+        """Give up an unfinished claim so that another worker can claim it."""
+        ...
+
+    def renew(self, shard: int, worker: str) -> None:
+        """Restart the lease of a claimed shard that is still running."""
+        ...
+
+
+class FileLockCoordinator:
+    """
+    Claims shards by creating lock files with O_EXCL in a directory that all
+    workers can see.
+    """
+
+    def __init__(
+        self, path: str | Path, lease_seconds: float = DEFAULT_LEASE_SECONDS
+    ) -> None:
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.lease_seconds = lease_seconds
+
+    def claim(self, shard: int, worker: str) -> bool:
+        if (self.path / f"shard-{shard:05d}.done").exists():
+            return False
+        lock = self.path / f"shard-{shard:05d}.lock"
+        try:
+            fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            try:
+                expired = time.time() - lock.stat().st_mtime > self.lease_seconds
+            except FileNotFoundError:
+                expired = True
+            if not expired:
+                return False
+            # Take over an expired lease; only one worker wins the rename
+            stale = lock.with_name(f"{lock.name}.{worker.replace(':', '_')}.stale")
+            try:
+                os.replace(lock, stale)
+                stale.unlink()
+            except FileNotFoundError:
+                return False
+            return self.claim(shard, worker)
+        with os.fdopen(fd, "w") as fh:
+            fh.write(worker)
+        return True
+
+    def complete(self, shard: int, worker: str) -> None:
+        (self.path / f"shard-{shard:05d}.done").write_text(worker)
+        (self.path / f"shard-{shard:05d}.lock").unlink(missing_ok=True)
+
+    def release(self, shard: int, worker: str) -> None:
+        lock = self.path / f"shard-{shard:05d}.lock"
+        try:
+            if lock.read_text() == worker:
+                lock.unlink()
+        except FileNotFoundError:
+            pass
+
+    def renew(self, shard: int, worker: str) -> None:
+        # The lease runs from the lock file's mtime
+        lock = self.path / f"shard-{shard:05d}.lock"
+        try:
+            if lock.read_text() == worker:
+                os.utime(lock)
+        except FileNotFoundError:
+            pass
+
+
+class SqliteCoordinator:
+    """Claims shards in a SQLite database; for a single host or tests."""
+
+    def __init__(
+        self, path: str | Path, lease_seconds: float = DEFAULT_LEASE_SECONDS
+    ) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.lease_seconds = lease_seconds
+        con = self._connect()
+        with con:
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS shards ("
+                "shard INTEGER PRIMARY KEY, worker TEXT, claimed REAL, done INTEGER)"
+            )
+        con.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30, isolation_level="IMMEDIATE")
+
+    def claim(self, shard: int, worker: str) -> bool:
+        now = time.time()
+        con = self._connect()
+        try:
+            with con:
+                row = con.execute(
+                    "SELECT claimed, done FROM shards WHERE shard = ?", (shard,)
+                ).fetchone()
+                if row is not None and (row[1] or now - row[0] <= self.lease_seconds):
+                    return False
+                con.execute(
+                    "INSERT OR REPLACE INTO shards VALUES (?, ?, ?, 0)",
+                    (shard, worker, now),
+                )
+                return True
+        finally:
+            con.close()
+
+    def complete(self, shard: int, worker: str) -> None:
+        con = self._connect()
+        with con:
+            con.execute(
+                "UPDATE shards SET done = 1, worker = ? WHERE shard = ?",
+                (worker, shard),
+            )
+        con.close()
+
+    def release(self, shard: int, worker: str) -> None:
+        con = self._connect()
+        with con:
+            con.execute(
+                "DELETE FROM shards WHERE shard = ? AND worker = ? AND done = 0",
+                (shard, worker),
+            )
+        con.close()
+
+    def renew(self, shard: int, worker: str) -> None:
+        con = self._connect()
+        with con:
+            con.execute(
+                "UPDATE shards SET claimed = ? "
+                "WHERE shard = ? AND worker = ? AND done = 0",
+                (time.time(), shard, worker),
+            )
+        con.close()
+
+
+def get_coordinator(name: str, out_dir: Path) -> Coordinator:
+    if name == "file":
+        return FileLockCoordinator(out_dir / "locks")
+    if name == "sqlite":
+        return SqliteCoordinator(out_dir / "coordinator.db")
+    raise ValueError(f"Invalid coordinator: {name}. Must be file or sqlite")
+
+
+# ---------------------------------------------------------------------------- #
+# Worker & merge
+# ---------------------------------------------------------------------------- #
+def run_unit(unit: WorkUnit, args: argparse.Namespace, store=None) -> pd.DataFrame:
+    """Efficient frontier of one work unit, with the unit as leading columns."""
+    scenario = load_scenario(unit.scenario, validate=False)
+    tickers_and_constraints = scenario.tickers_and_constraints
+    adj_daily_close = get_prices(
+        args.provider,
+        tickers_and_constraints["Ticker"].tolist(),
+        unit.start,
+        unit.end,
+        args.prices_csv,
+        store,
+    )
+    efficient_frontier = ef.get_efficient_frontier(
+        tickers_and_constraints,
+        args.risk_free_rate / 100,
+        adj_daily_close,
+        pairwise=args.pairwise,
+        frequency=args.frequency,
+        group_constraints=scenario.group_constraints,
+        store=store,
+    )
+    efficient_frontier.insert(0, "Point", efficient_frontier.index)
+    efficient_frontier.insert(0, "End", unit.end)
+    efficient_frontier.insert(0, "Start", unit.start)
+    efficient_frontier.insert(0, "Scenario", unit.scenario)
+    return efficient_frontier
+
+
+def get_worker_id() -> str:
+    """Id of this worker process, unique across hosts."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def run_shard(
+    units: list[WorkUnit],
+    out_file: Path,
+    args: argparse.Namespace,
+    worker: str,
+    store=None,
+    on_unit: Callable[[], None] | None = None,
+) -> None:
+    """
+    Calculate all units of a shard and write them as one JSONL file.
+    on_unit is called after every unit, e.g. to renew the shard's lease.
+    """
+    tmp = out_file.with_name(f"{out_file.name}.{worker.replace(':', '_')}.tmp")
+    try:
+        with open(tmp, "w") as fh:
+            for unit in units:
+                df = run_unit(unit, args, store)
+                # Tickers differ by scenario, so every record carries its own keys
+                for record in df.to_dict(orient="records"):
+                    fh.write(json.dumps(record) + "\n")
+                if on_unit is not None:
+                    on_unit()
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    os.replace(tmp, out_file)
+
+
+def run_worker(
+    units: list[WorkUnit],
+    num_shards: int,
+    coordinator: Coordinator,
+    out_dir: Path,
+    args: argparse.Namespace,
+    store=None,
+    worker: str | None = None,
+) -> tuple[list[int], list[int]]:
+    """
+    Claim and run shards until none are left. A shard that fails is released
+    and the worker continues with the next one.
+
+    Args:
+        worker (str | None): worker id, see get_worker_id (the default)
+
+    Returns:
+        list[int]: shards run by this worker
+        list[int]: shards that failed in this worker
+    """
+    worker = worker or get_worker_id()
+    out_dir.mkdir(parents=True, exist_ok=True)
+    done = []
+    failed = []
+    for shard, shard_units in enumerate(plan_shards(units, num_shards)):
+        if not coordinator.claim(shard, worker):
+            continue
+        out_file = shard_file(out_dir, shard)
+        try:
+            if not out_file.exists():  # idempotent: never redo a finished shard
+                # Renew the lease after every unit, so a long shard is never
+                # claimed again while it runs
+                renew = partial(coordinator.renew, shard, worker)
+                run_shard(shard_units, out_file, args, worker, store, renew)
+        except Exception as e:
+            coordinator.release(shard, worker)
+            print(f"Shard {shard}: Error! {e}", file=sys.stderr)
+            failed.append(shard)
+            continue
+        except BaseException:
+            coordinator.release(shard, worker)
+            raise
+        coordinator.complete(shard, worker)
+        done.append(shard)
+    return done, failed
+
+
+def merge_shards(out_dir: Path, num_shards: int, merged: Path) -> int:
+    """
+    Concatenate all shard outputs into one JSONL file.
+
+    Returns:
+        int: number of records written
+    """
+    try:
+        plan = json.loads((out_dir / PLAN_FILE).read_text())
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Missing {PLAN_FILE} in {out_dir}") from None
+    if plan["num_shards"] != num_shards:
+        raise ValueError(
+            f"{out_dir} was written for {plan['num_shards']} shards, not {num_shards}"
+        )
+    missing = [i for i in range(num_shards) if not shard_file(out_dir, i).exists()]
+    if missing:
+        raise FileNotFoundError(
+            f"Missing shard outputs: {', '.join(str(i) for i in missing)}"
+        )
+    num_records = 0
+    tmp = merged.with_name(merged.name + ".tmp")
+    with open(tmp, "w") as out:
+        for shard in range(num_shards):
+            with open(shard_file(out_dir, shard)) as fh:
+                for line in fh:
+                    out.write(line)
+                    num_records += 1
+    os.replace(tmp, merged)
+    return num_records
+
+
+def parse_window(window: str) -> tuple[str, str]:
+    start, sep, end = window.partition(":")
+    if not sep or pd.Timestamp(end) < pd.Timestamp(start):
+        raise argparse.ArgumentTypeError(
+            f"Invalid window: {window}. Must be START:END with START <= END"
+        )
+    return start, end
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Sharded efficient frontier batches across several workers."
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    worker = sub.add_parser("worker", help="claim and run shards")
+    worker.add_argument("scenarios", nargs="+", help="scenario Excel workbooks")
+    worker.add_argument(
+        "--window",
+        type=parse_window,
+        action="append",
+        required=True,
+        help="date window START:END (YYYY-MM-DD), may be repeated",
+    )
+    worker.add_argument("--risk-free-rate", type=float, default=0.0)
+    worker.add_argument("--provider", choices=PROVIDERS, default="yfinance")
+    worker.add_argument("--prices-csv", help="price file for the csv provider")
+    worker.add_argument(
+        "--frequency", choices=list(ps.PERIODS_PER_YEAR), default="daily"
+    )
+    worker.add_argument(
+        "--pairwise",
+        action="store_true",
+        help="use pairwise-complete statistics for ragged histories",
+    )
+    worker.add_argument("--coordinator", choices=["file", "sqlite"], default="file")
+    worker.add_argument(
+        "--shared-store",
+        action="store_true",
+        help="reuse prices and covariance matrices through the local shared store",
+    )
+
+    merge = sub.add_parser("merge", help="combine the shard outputs")
+    merge.add_argument("--merged", default=None, help="merged output file")
+
+    for p in (worker, merge):
+        p.add_argument("--shards", type=int, required=True, help="number of shards")
+        p.add_argument("--output", default="shards", help="output directory")
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+    out_dir = Path(args.output)
+    if args.command == "merge":
+        merged = Path(args.merged) if args.merged else out_dir / "frontier.jsonl"
+        try:
+            num_records = merge_shards(out_dir, args.shards, merged)
+        except (FileNotFoundError, ValueError) as e:
+            print(f"Error! {e}", file=sys.stderr)
+            return 1
+        print(f"{num_records} records written to {merged}")
+        return 0
+
+    units = [
+        WorkUnit(str(Path(scenario)), start, end)
+        for scenario in args.scenarios
+        for start, end in args.window
+    ]
+    try:
+        check_plan(out_dir, get_plan(units, args.shards, args))
+    except ValueError as e:
+        print(f"Error! {e}", file=sys.stderr)
+        return 1
+    store = None
+    if args.shared_store:
+        from shared_store import SharedStore
+
+        store = SharedStore()
+    done, failed = run_worker(
+        units,
+        args.shards,
+        get_coordinator(args.coordinator, out_dir),
+        out_dir,
+        args,
+        store,
+    )
+    print(f"Shards completed by this worker: {done}")
+    if failed:
+        print(f"Shards failed in this worker: {failed}", file=sys.stderr)
+        return 1
+    return 0
+
+
+# ---------------------------------------------------------------------------- #
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+"""
+Shared, read-only store for price panels and statistics.
+
+DataFrames are written once as .npy files (values and index) in a shared
+directory, /dev/shm by default, and read back memory-mapped. Every process
+that reads an entry maps the same pages instead of holding its own pickled
+copy, so memory does not grow with the number of users or workers.
+
+Every DataFrame returned by the store holds a lease on its entry, recorded
+in a SQLite database next to the files. The lease is released when the
+DataFrame is garbage collected, when it expires (lease_seconds after the
+last get) or when its process exits. Eviction only removes the least
+recently used entries without a lease, and only when the store is over
+capacity. Evicting an entry that a view still maps is safe: its pages are
+freed when the last mapping is dropped.
+
+@author: evan_
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+import weakref
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+import numpy as np
+import pandas as pd
+
+DEFAULT_CAPACITY_BYTES: int = 2 * 1024**3
+
+# A lease not renewed by a get within this time no longer protects its entry
+DEFAULT_LEASE_SECONDS: float = 15 * 60
+
+
+def _default_dir() -> Path:
+    if "EFF_FRON_STORE_DIR" in os.environ:
+        return Path(os.environ["EFF_FRON_STORE_DIR"])
+    if os.path.isdir("/dev/shm"):
+        return Path("/dev/shm") / "eff_fron_store"
+    return Path(tempfile.gettempdir()) / "eff_fron_store"
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def get_frame_key(prefix: str, df: pd.DataFrame) -> str:
+    """Key derived from the content of df (values, index and columns)."""
+    h = hashlib.sha256()
+    h.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    h.update(json.dumps([str(c) for c in df.columns]).encode())
+    return f"{prefix}:{h.hexdigest()}"
+
+
+class SharedStore:
+    """
+    Memory-mapped DataFrame store shared by all processes on a host.
+
+    Only DataFrames with a single numeric dtype (prices, returns, covariance
+    matrices) are supported; they are stored as float64.
+    """
+
+    def __init__(
+        self,
+        path: str | Path | None = None,
+        capacity_bytes: int = DEFAULT_CAPACITY_BYTES,
+        lease_seconds: float = DEFAULT_LEASE_SECONDS,
+    ) -> None:
+        self.path = Path(path) if path is not None else _default_dir()
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.capacity_bytes = capacity_bytes
+        self.lease_seconds = lease_seconds
+        self._db = self.path / "store.db"
+        with self._connect() as con:
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "name TEXT PRIMARY KEY, key TEXT, nbytes INTEGER, last_access REAL)"
+            )
+            columns = [row[1] for row in con.execute("PRAGMA table_info(leases)")]
+            if columns and "token" not in columns:
+                con.execute("DROP TABLE leases")  # per-process leases; expired
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS leases ("
+                "token TEXT PRIMARY KEY, name TEXT, pid INTEGER, expires REAL)"
+            )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        con = sqlite3.connect(self._db, timeout=30, isolation_level="IMMEDIATE")
+        try:
+            with con:  # commit, or roll back on error
+                yield con
+        finally:
+            con.close()
+
+    @staticmethod
+    def _name(key: str) -> str:
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    def put(self, key: str, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Add df to the store (if not already present) and return the shared,
+        memory-mapped copy. df itself is returned if other processes keep
+        evicting the entry before this one can lease it.
+        """
+        name = self._name(key)
+        for _ in range(3):
+            if not (self.path / f"{name}.json").exists():
+                self._write(name, key, df)
+            df_shared = self.get(key)  # lease first, so eviction keeps this entry
+            if df_shared is not None:
+                self.evict()
+                return df_shared
+        return df
+
+    def _write(self, name: str, key: str, df: pd.DataFrame) -> None:
+        values = np.ascontiguousarray(df.to_numpy(dtype=np.float64))
+        tz = None
+        if isinstance(df.index, pd.DatetimeIndex):
+            tz = None if df.index.tz is None else str(df.index.tz)
+            index = df.index.tz_localize(None).to_numpy()
+        else:
+            index = df.index.to_numpy()
+            if index.dtype == object:
+                index = index.astype(str)
+        meta = {
+            "key": key,
+            "columns": [str(c) for c in df.columns],
+            "index_name": df.index.name,
+            "tz": tz,
+        }
+        # Write to temporary files, then rename, so readers never see
+        # partial files. The .json file is renamed last and marks the
+        # entry as complete. Sessions are threads of one process, so every
+        # writer thread has its own temporary files.
+        suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(self.path / f"{name}.values.npy{suffix}", "wb") as fh:
+            np.save(fh, values)
+        with open(self.path / f"{name}.index.npy{suffix}", "wb") as fh:
+            np.save(fh, index)
+        (self.path / f"{name}.json{suffix}").write_text(json.dumps(meta))
+        for part in ("values.npy", "index.npy", "json"):
+            tmp = self.path / f"{name}.{part}{suffix}"
+            os.replace(tmp, self.path / f"{name}.{part}")
+        with self._connect() as con:
+            con.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)",
+                (name, key, values.nbytes + index.nbytes, time.time()),
+            )
+
+    def get(self, key: str) -> pd.DataFrame | None:
+        """
+        Return the stored DataFrame, memory-mapped read-only, or None if key is
+        not in the store. The DataFrame holds a lease on the entry until it is
+        garbage collected, the lease expires, release is called or the
+        process exits.
+        """
+        name = self._name(key)
+        try:
+            meta = json.loads((self.path / f"{name}.json").read_text())
+            values = np.load(self.path / f"{name}.values.npy", mmap_mode="r")
+            index = np.load(self.path / f"{name}.index.npy", mmap_mode="r")
+        except FileNotFoundError:
+            return None
+        token = uuid.uuid4().hex
+        now = time.time()
+        with self._connect() as con:
+            con.execute(
+                "INSERT INTO leases VALUES (?, ?, ?, ?)",
+                (token, name, os.getpid(), now + self.lease_seconds),
+            )
+            con.execute(
+                "UPDATE entries SET last_access = ? WHERE name = ?", (now, name)
+            )
+        df_index = pd.Index(index, name=meta["index_name"])
+        if meta["tz"] is not None:
+            df_index = df_index.tz_localize(meta["tz"])
+        df = pd.DataFrame(
+            values,
+            index=df_index,
+            columns=meta["columns"],
+            copy=False,
+        )
+        # Exited processes are cleaned up by evict, not at interpreter exit
+        weakref.finalize(df, self._release_token, token).atexit = False
+        return df
+
+    def _release_token(self, token: str) -> None:
+        try:
+            with self._connect() as con:
+                con.execute("DELETE FROM leases WHERE token = ?", (token,))
+        except sqlite3.Error:
+            pass  # the lease expires anyway
+
+    def release(self, key: str) -> None:
+        """Release all of this process's leases on key."""
+        with self._connect() as con:
+            con.execute(
+                "DELETE FROM leases WHERE name = ? AND pid = ?",
+                (self._name(key), os.getpid()),
+            )
+
+    def evict(self) -> None:
+        """
+        Remove least recently used entries without live leases until the
+        store is within capacity.
+        """
+        with self._connect() as con:
+            # Drop expired leases and leases of processes that have exited
+            con.execute("DELETE FROM leases WHERE expires < ?", (time.time(),))
+            pids = [row[0] for row in con.execute("SELECT DISTINCT pid FROM leases")]
+            for pid in pids:
+                if not _pid_alive(pid):
+                    con.execute("DELETE FROM leases WHERE pid = ?", (pid,))
+
+            total = con.execute("SELECT COALESCE(SUM(nbytes), 0) FROM entries")
+            total_bytes = total.fetchone()[0]
+            if total_bytes <= self.capacity_bytes:
+                return
+            candidates = con.execute(
+                "SELECT name, nbytes FROM entries WHERE name NOT IN "
+                "(SELECT name FROM leases) ORDER BY last_access"
+            ).fetchall()
+            for name, nbytes in candidates:
+                if total_bytes <= self.capacity_bytes:
+                    break
+                for part in ("json", "values.npy", "index.npy"):
+                    (self.path / f"{name}.{part}").unlink(missing_ok=True)
+                con.execute("DELETE FROM entries WHERE name = ?", (name,))
+                total_bytes -= nbytes
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+"""
+Shared fixtures. The modules live in the repository root, so it is added to
+sys.path for the tests.
+
+@author: evan_
+"""
+import sys
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+
+@pytest.fixture
+def adj_close() -> pd.DataFrame:
+    """Three years of adjusted daily closes for 6 tickers."""
+    rng = np.random.default_rng(0)
+    dates = pd.bdate_range("2015-01-01", periods=756)
+    ln_returns = rng.normal(0.0004, 0.01, (len(dates), 6))
+    prices = 100 * np.exp(np.cumsum(ln_returns, axis=0))
+    return pd.DataFrame(prices, index=dates, columns=[f"T{i}" for i in range(6)])
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""
+@author: evan_
+"""
+import numpy as np
+import pandas as pd
+import pytest
+import efrontier as ef
+
+
+@pytest.fixture
+def inv_and_constraints(adj_close) -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "Ticker": adj_close.columns,
+            "Min Weight": 0.0,
+            "Max Weight": 0.4,
+            "Sector": ["A", "A", "A", "B", "B", "B"],
+        }
+    )
+
+
+def _groups(min_weight, max_weight, group="A") -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "Group Type": ["Sector"],
+            "Group": [group],
+            "Min Weight": [min_weight],
+            "Max Weight": [max_weight],
+        }
+    )
+
+
+def test_blank_group_limit_is_unconstrained(inv_and_constraints):
+    a, b = ef.get_group_constraint_matrix(inv_and_constraints, _groups(np.nan, 0.6))
+    np.testing.assert_array_equal(b, [0.6, -0.0])
+    a, b = ef.get_group_constraint_matrix(inv_and_constraints, _groups(0.2, np.nan))
+    np.testing.assert_array_equal(b, [1.0, -0.2])
+
+
+@pytest.mark.parametrize(
+    "groups", [_groups(0.7, 0.6), _groups(0.1, 0.6, group="C")]
+)
+def test_invalid_groups_raise(inv_and_constraints, groups):
+    with pytest.raises(ValueError):
+        ef.get_group_constraint_matrix(inv_and_constraints, groups)
+
+
+def test_cvar_frontier_respects_groups(inv_and_constraints, adj_close):
+    frontier = ef.get_cvar_efficient_frontier(
+        inv_and_constraints, 0.02, adj_close, group_constraints=_groups(0.5, 0.7)
+    )
+    weights = frontier[inv_and_constraints["Ticker"]]
+    group_a = weights.iloc[:, :3].sum(axis=1)
+    assert (group_a >= 0.5 - 1e-7).all() and (group_a <= 0.7 + 1e-7).all()
+    np.testing.assert_allclose(weights.sum(axis=1), 1)
+    # Interior points lie on the 0.005 grid of target returns
+    interior = frontier["Return"].iloc[1:-1].to_numpy()
+    np.testing.assert_allclose(interior, np.round(interior / 0.005) * 0.005, atol=1e-6)
+
+
+def test_cvar_frontier_infeasible_bounds_raise(inv_and_constraints, adj_close):
+    infeasible = inv_and_constraints.assign(**{"Max Weight": 0.1})
+    with pytest.raises(ValueError, match="infeasible"):
+        ef.get_cvar_efficient_frontier(infeasible, 0.02, adj_close)
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""
+@author: evan_
+"""
+import numpy as np
+import pandas as pd
+import pytest
+import port_stats as ps
+
+
+def test_pairwise_cov_matches_pandas(adj_close):
+    ragged = adj_close.copy()
+    ragged.iloc[:300, 0] = np.nan  # later listing
+    ragged.iloc[500:, 1] = np.nan  # delisted
+    ln_returns = ps.get_pairwise_daily_ln_returns(ragged)
+    cov = ps.get_pairwise_cov_matrix(ln_returns)
+    expected = ln_returns.cov(min_periods=2)
+    np.testing.assert_allclose(cov.to_numpy(), expected.to_numpy(), atol=1e-15)
+
+
+def test_nearest_psd_matrix_keeps_variances():
+    cov = pd.DataFrame([[1.0, 0.9, -0.9], [0.9, 1.0, 0.9], [-0.9, 0.9, 1.0]])
+    assert np.linalg.eigvalsh(cov.to_numpy()).min() < 0
+    psd = ps.get_nearest_psd_matrix(cov)
+    assert np.linalg.eigvalsh(psd.to_numpy()).min() >= 0
+    np.testing.assert_allclose(np.diag(psd), np.diag(cov))
+
+
+def _growth_loop(weights, prices, period_end):
+    # Reference: rebalance to the target weights at every period end
+    value = 1.0
+    holdings = weights / prices[0]
+    growth = []
+    for t in range(len(prices)):
+        value = holdings @ prices[t]
+        growth.append(value)
+        if period_end[t]:
+            holdings = value * weights / prices[t]
+    return np.array(growth) * 10000
+
+
+@pytest.mark.parametrize("rebalance", [None, "monthly", "quarterly", "annually"])
+def test_frontier_growth_matches_loop(adj_close, rebalance):
+    rng = np.random.default_rng(1)
+    weights = rng.dirichlet(np.ones(adj_close.shape[1]), size=3)
+    eff_fron = pd.DataFrame(weights, columns=adj_close.columns)
+    growth = ps.get_frontier_growth_10000(eff_fron, adj_close, rebalance)
+
+    if rebalance is None:
+        period_end = np.zeros(len(adj_close), dtype=bool)
+    else:
+        freq = {"monthly": "M", "quarterly": "Q", "annually": "Y"}[rebalance]
+        codes = adj_close.index.to_period(freq).asi8
+        period_end = np.r_[codes[1:] != codes[:-1], True]
+    for i, w in enumerate(weights):
+        expected = _growth_loop(w, adj_close.to_numpy(), period_end)
+        np.testing.assert_allclose(growth[i].to_numpy(), expected, rtol=1e-10)
+
+
+def test_resample_prices_rejects_unknown_frequency(adj_close):
+    with pytest.raises(ValueError):
+        ps.resample_prices(adj_close, "hourly")
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""
+@author: evan_
+"""
+import numpy as np
+import pandas as pd
+import render
+
+
+def _lttb_reference(x, y, n_out):
+    # Straightforward single-series LTTB with the same bucket edges
+    n = len(x)
+    edges = np.append(np.linspace(1, n - 1, n_out - 1).astype(int), n)
+    out = [0]
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nxt = slice(edges[i + 1], edges[i + 2])
+        avg_x, avg_y = x[nxt].mean(), y[nxt].mean()
+        best, best_area = lo, -1.0
+        for j in range(lo, hi):
+            area = abs((x[a] - avg_x) * (y[j] - y[a]) - (x[a] - x[j]) * (avg_y - y[a]))
+            if area > best_area:
+                best, best_area = j, area
+        out.append(best)
+        a = best
+    out.append(n - 1)
+    return np.array(out)
+
+
+def test_lttb_matches_reference():
+    rng = np.random.default_rng(0)
+    x = np.arange(1000, dtype=float)
+    y = np.cumsum(rng.normal(size=(1000, 3)), axis=0)
+    idx = render.lttb_indices(x, y, 100)
+    for k in range(3):
+        np.testing.assert_array_equal(idx[:, k], _lttb_reference(x, y[:, k], 100))
+
+
+def test_downsample_keeps_endpoints_and_budget(adj_close):
+    series = render.downsample(adj_close, max_points=50)
+    for c, s in series.items():
+        assert len(s) == 50
+        assert s.index[0] == adj_close.index[0]
+        assert s.index[-1] == adj_close.index[-1]
+        assert s.index.is_monotonic_increasing
+
+
+def test_pages_cover_all_rows():
+    df = pd.DataFrame({"x": range(1201)})
+    pages = render.num_pages(df, page_size=500)
+    assert pages == 3
+    rows = pd.concat([render.get_page(df, p, 500) for p in range(1, pages + 1)])
+    assert rows.equals(df)
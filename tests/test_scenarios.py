@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""
+@author: evan_
+"""
+import hashlib
+import threading
+import pandas as pd
+import pytest
+import scenarios
+import yfinance_api
+from conftest import ROOT
+
+WORKBOOK = ROOT / "data" / "youtube.xlsx"
+
+
+@pytest.fixture(autouse=True)
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(scenarios, "CACHE_DIR", tmp_path / "scenarios")
+    monkeypatch.setattr(scenarios, "_scenarios", {})
+    monkeypatch.setattr(scenarios, "_unvalidated", {})
+    monkeypatch.setattr(scenarios, "_path_hashes", {})
+    monkeypatch.setattr(
+        yfinance_api,
+        "get_investment_names",
+        lambda tickers: ("", pd.DataFrame({"longName": tickers}, index=tickers)),
+    )
+    return tmp_path / "scenarios"
+
+
+def test_digest_is_content_hash():
+    scenario = scenarios.load_scenario(WORKBOOK, validate=False)
+    assert scenario.digest == hashlib.sha256(WORKBOOK.read_bytes()).hexdigest()
+
+
+def test_cached_copies_are_independent(cache):
+    first = scenarios.load_scenario(WORKBOOK)
+    first.tickers_and_constraints.loc[0, "Max Weight"] = -1
+    second = scenarios.load_scenario(WORKBOOK)
+    assert second.tickers_and_constraints.loc[0, "Max Weight"] != -1
+    assert len(list(cache.glob("*.pkl"))) == 1
+
+
+def test_concurrent_validation_of_same_workbook(cache):
+    # Streamlit sessions are threads of one server process
+    barrier = threading.Barrier(8)
+    errors = []
+
+    def load():
+        barrier.wait()
+        try:
+            scenarios.load_scenario(WORKBOOK)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=load) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+    assert [p.suffix for p in cache.iterdir()] == [".pkl"]
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+"""
+@author: evan_
+"""
+import argparse
+import random
+import time
+import pandas as pd
+import pytest
+import sharding
+from sharding import (
+    FileLockCoordinator,
+    SqliteCoordinator,
+    WorkUnit,
+    check_plan,
+    get_plan,
+    plan_shards,
+)
+from conftest import ROOT
+
+WORKBOOK = str(ROOT / "data" / "youtube.xlsx")
+
+UNITS = [
+    WorkUnit(f"scenario_{s}.xlsx", f"20{y:02d}-01-01", f"20{y + 5:02d}-12-31")
+    for s in range(5)
+    for y in range(10)
+]
+
+
+@pytest.fixture(params=["file", "sqlite"])
+def make_coordinator(request, tmp_path):
+    def make(lease_seconds: float = sharding.DEFAULT_LEASE_SECONDS):
+        if request.param == "file":
+            return FileLockCoordinator(tmp_path / "locks", lease_seconds)
+        return SqliteCoordinator(tmp_path / "coordinator.db", lease_seconds)
+
+    return make
+
+
+def _args(**kwargs) -> argparse.Namespace:
+    defaults = dict(
+        risk_free_rate=0.0,
+        frequency="daily",
+        pairwise=False,
+        provider="csv",
+        prices_csv="prices.csv",
+    )
+    return argparse.Namespace(**{**defaults, **kwargs})
+
+
+# ---------------------------------------------------------------------------- #
+# Coordinators
+# ---------------------------------------------------------------------------- #
+def test_claim_is_exclusive(make_coordinator):
+    coordinator = make_coordinator()
+    assert coordinator.claim(0, "a")
+    assert not coordinator.claim(0, "b")
+    assert coordinator.claim(1, "b")
+
+
+def test_completed_shard_is_never_claimed(make_coordinator):
+    coordinator = make_coordinator(lease_seconds=0)
+    assert coordinator.claim(0, "a")
+    coordinator.complete(0, "a")
+    time.sleep(0.01)
+    assert not coordinator.claim(0, "b")
+
+
+def test_release_only_by_owner(make_coordinator):
+    coordinator = make_coordinator()
+    assert coordinator.claim(0, "a")
+    coordinator.release(0, "b")
+    assert not coordinator.claim(0, "b")
+    coordinator.release(0, "a")
+    assert coordinator.claim(0, "b")
+
+
+def test_expired_claim_is_taken_over(make_coordinator):
+    coordinator = make_coordinator(lease_seconds=0.2)
+    assert coordinator.claim(0, "a")
+    assert not coordinator.claim(0, "b")
+    time.sleep(0.3)
+    assert coordinator.claim(0, "b")
+
+
+def test_renewed_claim_does_not_expire(make_coordinator):
+    coordinator = make_coordinator(lease_seconds=0.3)
+    assert coordinator.claim(0, "a")
+    for _ in range(3):
+        time.sleep(0.2)
+        coordinator.renew(0, "a")
+        assert not coordinator.claim(0, "b")
+
+
+# ---------------------------------------------------------------------------- #
+# Planning
+# ---------------------------------------------------------------------------- #
+def test_plan_shards_is_deterministic():
+    shuffled = UNITS.copy()
+    random.Random(0).shuffle(shuffled)
+    shards = plan_shards(UNITS, 7)
+    assert plan_shards(shuffled + shuffled[:5], 7) == shards
+    assert sorted(u for shard in shards for u in shard) == sorted(UNITS)
+    # Stable numbers: sha256 of the unit, not Python's salted hash()
+    assert [sharding.get_shard(u, 7) for u in UNITS[:3]] == [
+        sharding.get_shard(WorkUnit(*u), 7) for u in UNITS[:3]
+    ]
+
+
+def test_check_plan_refuses_another_plan(tmp_path):
+    units = [WorkUnit(WORKBOOK, "2010-01-01", "2012-12-31")]
+    plan = get_plan(units, 4, _args())
+    check_plan(tmp_path, plan)
+    check_plan(tmp_path, get_plan(units, 4, _args()))  # same plan
+    for other in (
+        get_plan(units, 8, _args()),
+        get_plan(units, 4, _args(risk_free_rate=2.0)),
+        get_plan(units, 4, _args(pairwise=True)),
+        get_plan(units + [WorkUnit(WORKBOOK, "2013-01-01", "2015-12-31")], 4, _args()),
+    ):
+        with pytest.raises(ValueError):
+            check_plan(tmp_path, other)
+
+
+def test_check_plan_refuses_changed_workbook(tmp_path):
+    workbook = tmp_path / "scenario.xlsx"
+    workbook.write_bytes((ROOT / "data" / "youtube.xlsx").read_bytes())
+    units = [WorkUnit(str(workbook), "2010-01-01", "2012-12-31")]
+    out_dir = tmp_path / "shards"
+    check_plan(out_dir, get_plan(units, 4, _args()))
+    workbook.write_bytes(workbook.read_bytes() + b"\0")
+    with pytest.raises(ValueError):
+        check_plan(out_dir, get_plan(units, 4, _args()))
+
+
+def test_check_plan_refuses_outputs_without_plan(tmp_path):
+    sharding.shard_file(tmp_path, 0).write_text("")
+    units = [WorkUnit(WORKBOOK, "2010-01-01", "2012-12-31")]
+    with pytest.raises(ValueError):
+        check_plan(tmp_path, get_plan(units, 4, _args()))
+
+
+def test_merge_refuses_other_shard_count(tmp_path):
+    units = [WorkUnit(WORKBOOK, "2010-01-01", "2012-12-31")]
+    check_plan(tmp_path, get_plan(units, 4, _args()))
+    with pytest.raises(ValueError):
+        sharding.merge_shards(tmp_path, 8, tmp_path / "frontier.jsonl")
+
+
+# ---------------------------------------------------------------------------- #
+# Worker
+# ---------------------------------------------------------------------------- #
+def test_failed_shard_is_released(tmp_path, monkeypatch):
+    failing = UNITS[0]
+
+    def run_unit(unit, args, store=None):
+        if unit == failing:
+            raise ValueError("Invalid Ticker: XYZ")
+        return pd.DataFrame({"Scenario": [unit.scenario]})
+
+    monkeypatch.setattr(sharding, "run_unit", run_unit)
+    coordinator = SqliteCoordinator(tmp_path / "coordinator.db")
+    done, failed = sharding.run_worker(
+        UNITS, 4, coordinator, tmp_path, _args(), worker="a"
+    )
+    bad_shard = sharding.get_shard(failing, 4)
+    assert failed == [bad_shard]
+    assert sorted(done) == [s for s in range(4) if s != bad_shard]
+    assert not sharding.shard_file(tmp_path, bad_shard).exists()
+    assert list(tmp_path.glob("*.tmp")) == []
+    assert coordinator.claim(bad_shard, "b")  # free for another worker
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+@author: evan_
+"""
+import gc
+import threading
+import time
+import numpy as np
+import pandas as pd
+from shared_store import SharedStore
+
+
+def _frame(i: float, rows: int = 4000) -> pd.DataFrame:
+    return pd.DataFrame({"x": np.full(rows, float(i))})
+
+
+def _stored_bytes(store: SharedStore) -> int:
+    with store._connect() as con:
+        return con.execute("SELECT COALESCE(SUM(nbytes), 0) FROM entries").fetchone()[0]
+
+
+def _in_store(store: SharedStore, key: str) -> bool:
+    return (store.path / f"{store._name(key)}.json").exists()
+
+
+def test_round_trip(tmp_path, adj_close):
+    store = SharedStore(tmp_path)
+    shared = store.put("adj_close:test", adj_close)
+    pd.testing.assert_frame_equal(shared, adj_close, check_freq=False)
+    assert not shared.to_numpy().flags.writeable
+    assert store.get("adj_close:missing") is None
+
+
+def test_capacity_enforced_in_long_lived_process(tmp_path):
+    # One entry is held throughout; 20 more are put and dropped right away
+    entry_bytes = 2 * 4000 * 8  # values and index
+    capacity = 4 * entry_bytes
+    store = SharedStore(tmp_path, capacity_bytes=capacity)
+    held = store.put("check:held", _frame(-1))
+    for i in range(20):
+        store.put(f"check:{i}", _frame(i))
+    assert _stored_bytes(store) <= capacity
+    assert len(list(tmp_path.glob("*.npy"))) <= 2 * 4
+    assert _in_store(store, "check:held")
+    assert held["x"].iloc[0] == -1
+
+
+def test_lease_released_when_frame_dropped(tmp_path):
+    store = SharedStore(tmp_path, capacity_bytes=0)
+    df = store.put("a", _frame(1))
+    store.evict()
+    assert _in_store(store, "a")  # leased
+    del df
+    gc.collect()
+    store.evict()
+    assert not _in_store(store, "a")
+
+
+def test_lease_expires(tmp_path):
+    store = SharedStore(tmp_path, capacity_bytes=0, lease_seconds=0.2)
+    df = store.put("a", _frame(1))
+    time.sleep(0.3)
+    store.evict()
+    assert not _in_store(store, "a")
+    assert df["x"].sum() == 4000  # the mapping outlives the evicted files
+
+
+def test_concurrent_put_same_key(tmp_path):
+    # Streamlit sessions are threads of one process
+    store = SharedStore(tmp_path)
+    df = pd.DataFrame(np.random.default_rng(0).random((20000, 10)))
+    barrier = threading.Barrier(8)
+    errors = []
+
+    def put():
+        barrier.wait()
+        try:
+            store.put("adj_close:X", df)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=put) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+    assert list(tmp_path.glob("*.tmp")) == []
+    np.testing.assert_array_equal(store.get("adj_close:X").to_numpy(), df.to_numpy())
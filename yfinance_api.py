@@ -4,11 +4,12 @@ Created on Tue Jun  4 15:50:42 2024
 
 @author: evan_
 """
-from typing import Tuple
+from typing import Tuple, TYPE_CHECKING
 from datetime import datetime
 import pandas as pd
-import yfinance as yf  # type: ignore
-import streamlit as st
+
+if TYPE_CHECKING:
+    from shared_store import SharedStore
 
 
 # ---------------------------------------------------------------------------- #
@@ -30,6 +31,8 @@ def get_investment_names(tickers: list[str]) -> Tuple[str, pd.DataFrame]:
             Index: ticker
             df Contents: Short Name for each investment. Empty df if errors.
     """
+    import yfinance as yf  # type: ignore
+
     err = ""
     investment_names = pd.DataFrame()
     for t in tickers:
@@ -44,7 +47,10 @@ def get_investment_names(tickers: list[str]) -> Tuple[str, pd.DataFrame]:
 
 # ---------------------------------------------------------------------------- #
 def get_adj_daily_close(
-    tickers: list[str], start_date: str|datetime, end_date: str|datetime
+    tickers: list[str],
+    start_date: str|datetime,
+    end_date: str|datetime,
+    store: "SharedStore | None" = None,
 ) -> pd.DataFrame:
     """
     Retrieve adjusted daily closing prices for a list of tickers over a specified
@@ -57,6 +63,8 @@ def get_adj_daily_close(
         tickers (list[str]): List of tickers to be retrieved
         start_date (str): Start date in format YYYY-MM-DD
         end_date (str): End date in format YYYY-MM-DD
+        store (SharedStore | None): if specified, prices are read from / added to
+            this shared store and the returned df is memory-mapped read-only
 
     Returns:
         pd.DataFrame:
@@ -64,10 +72,19 @@ def get_adj_daily_close(
             Index: Date
             df Contents: Adjusted daily closing prices
     """
+    if store is not None:
+        key = f"adj_close:{','.join(tickers)}:{start_date}:{end_date}"
+        adj_close = store.get(key)
+        if adj_close is not None:
+            return adj_close
+    import yfinance as yf  # type: ignore
+
     # Retrieve daily
     adj_close = yf.download(tickers, start=start_date, end=end_date, interval="1d")[
         "Adj Close"
     ][tickers]
+    if store is not None:
+        adj_close = store.put(key, adj_close)
     return adj_close
 
 